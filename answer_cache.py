@@ -0,0 +1,88 @@
+"""
+Bounded TTL + LRU cache for chatbot answers
+Keys are normalized utterances so "How much does mowing cost?" and
+"um, how much does mowing cost" share an entry; pronouns and modals are
+kept, since "can you mow" and "can I mow" are different questions
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Words that carry no meaning for answer lookup
+FILLER_WORDS = frozenset([
+    'um', 'umm', 'uh', 'uhh', 'er', 'ah', 'hmm', 'like', 'so', 'well', 'okay', 'ok',
+    'yeah', 'hi', 'hello', 'hey', 'please', 'just', 'actually', 'basically', 'the',
+    'a', 'an', 'wondering',
+])
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def _stem(word):
+    """Strip a common English suffix, keeping at least a 3-letter root"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize_utterance(text, stem=True):
+    """Lowercase, drop punctuation and filler words, optionally stem"""
+    words = _NON_WORD.sub(' ', text.lower()).replace("'", '').split()
+    words = [word for word in words if word not in FILLER_WORDS]
+    if stem:
+        words = [_stem(word) for word in words]
+    return ' '.join(words)
+
+
+class AnswerCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, max_size=512, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached answer for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, answer, ttl=None):
+        """Store answer under key, evicting the least recently used entry"""
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + (ttl or self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
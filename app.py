@@ -1,12 +1,35 @@
-from flask import Flask, request, Response
-import requests
+from flask import Flask, request, Response, g, abort, has_app_context
 import os
-from twilio.twiml.voice_response import VoiceResponse
+import hmac
+import time
+from urllib.parse import urlencode
+from twilio.twiml.voice_response import VoiceResponse, Dial, Enqueue, Record, Say
 from twilio.rest import Client
+from twilio.base.exceptions import TwilioRestException
 import logging
 import json
 from datetime import datetime
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+from intents import IntentMatcher
+from twiml_cache import TwimlCache
+from chatbot_client import ChatbotClient, SENTENCE_END
+from resilient_chatbot import ResilientChatbot, BREAKER_OPEN, CLOSED, HALF_OPEN, OPEN
+from answer_cache import AnswerCache, normalize_utterance
+from call_sessions import make_session_store
+from conversation import ConversationPolicy, TRANSFER, GOODBYE, CONTINUE
+from pending_answers import PendingAnswers, PENDING, MISSING
+import call_events
+from call_records import CallRecordStore
+from callbacks import CallbackQueue, CallbackRejected
+from recordings import RecordingArchive, make_storage
+from metrics import Counter, Gauge, Histogram, REGISTRY
+from profiling import Profiler
+from twilio_signature import TwilioSignatureValidator
+from rate_limit import make_rate_limiter
+from forwarding import ForwardingDispatcher
+import tenants
+from tenants import Tenant, TenantRegistry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,28 +46,539 @@ TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 CHATBOT_ID = os.getenv('CHATBOT_ID', '3947607fe')  # Your Green Slice chatbot ID
 CHATBOT_URL = f"https://apps.abacus.ai/chatllm/{CHATBOT_ID}"
 OWNER_PHONE = os.getenv('OWNER_PHONE')  # Phone number to forward calls to
-BUSINESS_NAME = os.getenv('BUSINESS_NAME', 'Green Slice Lawn Care and Window Washing')
+BUSINESS_NAME = os.getenv('BUSINESS_NAME', 'Green Slice Lawn Care and Window Washing')  # Unless the knowledge base names one
 WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL')  # Your deployed app URL
+CHATBOT_API_URL = os.getenv('CHATBOT_API_URL')  # Streaming ChatLLM endpoint; canned answers when unset
+CHATBOT_API_KEY = os.getenv('CHATBOT_API_KEY')
+CHATBOT_TIMEOUT = float(os.getenv('CHATBOT_TIMEOUT', '8'))  # Must leave room in Twilio's 15s webhook budget
+CHATBOT_POOL_SIZE = int(os.getenv('CHATBOT_POOL_SIZE', '32'))  # Keep-alive connections; match worker threads
+CHATBOT_SECONDARY_API_URL = os.getenv('CHATBOT_SECONDARY_API_URL')  # Failover/hedge endpoint (optional)
+CHATBOT_SECONDARY_API_KEY = os.getenv('CHATBOT_SECONDARY_API_KEY')  # Defaults to CHATBOT_API_KEY
+CHATBOT_HEDGE_AFTER = float(os.getenv('CHATBOT_HEDGE_AFTER', '2'))  # Seconds before racing the secondary; 0 = failover only
+CHATBOT_BREAKER_FAILURES = int(os.getenv('CHATBOT_BREAKER_FAILURES', '5'))  # Consecutive failures that open the breaker
+CHATBOT_BREAKER_RESET_SECONDS = float(os.getenv('CHATBOT_BREAKER_RESET_SECONDS', '30'))  # Open time before a trial call
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '512'))  # Cached chatbot answers
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))  # Seconds before a cached answer expires
+ANSWER_CACHE_STEM = os.getenv('ANSWER_CACHE_STEM', 'true').lower() == 'true'
+KNOWLEDGE_BASE_PATH = os.getenv('KNOWLEDGE_BASE_PATH', 'knowledge_base.json')  # Greeting, answers and FAQ
+KNOWLEDGE_BASE_POLL_SECONDS = float(os.getenv('KNOWLEDGE_BASE_POLL_SECONDS', '5'))  # How often edits are picked up
+TENANTS_FILE = os.getenv('TENANTS_FILE')  # Extra businesses routed by their Twilio number; see tenants.py
+FAQ_MIN_SCORE = float(os.getenv('FAQ_MIN_SCORE', '0.5'))  # Cosine similarity needed to skip the chatbot
+FAQ_FALLBACK_MIN_SCORE = float(os.getenv('FAQ_FALLBACK_MIN_SCORE', '0.3'))  # Looser match when the chatbot is down
+SPEECH_MIN_CONFIDENCE = float(os.getenv('SPEECH_MIN_CONFIDENCE', '0.3'))  # Below this, transfer unless it's a known question
+SPEECH_REPAIR_CONFIDENCE = float(os.getenv('SPEECH_REPAIR_CONFIDENCE', '0.6'))  # Below this (down to the minimum), fix misheard words
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL')  # Share call sessions across gunicorn workers
+SESSION_MAX_TURNS = int(os.getenv('SESSION_MAX_TURNS', '10'))  # Turns of history kept per call
+SESSION_MAX_CALLS = int(os.getenv('SESSION_MAX_CALLS', '1000'))  # Live calls tracked per worker
+SESSION_IDLE_TIMEOUT = int(os.getenv('SESSION_IDLE_TIMEOUT', '900'))  # Seconds before an idle call is dropped
+MAX_CALL_TURNS = int(os.getenv('MAX_CALL_TURNS', '5'))  # Questions answered before the call is wrapped up
+MAX_CALL_SECONDS = int(os.getenv('MAX_CALL_SECONDS', '300'))  # Call age after which no new question is gathered
+FORWARD_NUMBERS = [n.strip() for n in os.getenv('FORWARD_NUMBERS', '').split(',') if n.strip()]  # Staff to ring; default OWNER_PHONE
+FORWARD_STRATEGY = os.getenv('FORWARD_STRATEGY', 'ordered')  # 'ordered' (top of the list first) or 'round_robin'
+FORWARD_MAX_CALLS = int(os.getenv('FORWARD_MAX_CALLS', '1'))  # Simultaneous forwarded calls per staff number
+FORWARD_RING_SECONDS = int(os.getenv('FORWARD_RING_SECONDS', '20'))  # Ring time before trying the next number
+FORWARD_WHEN_BUSY = os.getenv('FORWARD_WHEN_BUSY', 'queue')  # 'queue' (hold for the next free person) or 'callback'
+FORWARD_QUEUE_MAX_WAIT = int(os.getenv('FORWARD_QUEUE_MAX_WAIT', '180'))  # Seconds on hold before taking a message
+ASYNC_ANSWERS = os.getenv('ASYNC_ANSWERS', 'false').lower() == 'true'  # Filler + redirect while the chatbot thinks
+ANSWER_WORKERS = int(os.getenv('ANSWER_WORKERS', '8'))  # Background threads for chatbot calls
+ANSWER_POLL_SECONDS = int(os.getenv('ANSWER_POLL_SECONDS', '1'))  # Pause between answer polls
+CALL_EVENT_LOG = os.getenv('CALL_EVENT_LOG', '-')  # JSON-lines call events; '-' for stdout
+CALL_EVENT_LEVEL = os.getenv('CALL_EVENT_LEVEL', 'INFO')  # WARNING or higher turns events off
+CALL_EVENT_BATCH = int(os.getenv('CALL_EVENT_BATCH', '100'))  # Events written per batch
+CALL_EVENT_FLUSH_SECONDS = float(os.getenv('CALL_EVENT_FLUSH_SECONDS', '1'))
+CALL_RECORDS_DB = os.getenv('CALL_RECORDS_DB', 'call_records.db')  # SQLite call history; empty to disable
+CALLBACKS_DB = os.getenv('CALLBACKS_DB', 'callbacks.db')  # SQLite callback requests; empty to disable
+CALLBACK_NOTIFY = os.getenv('CALLBACK_NOTIFY', 'sms')  # 'sms' staff the request, or 'call' staff and connect the caller
+CALLBACK_WORKERS = int(os.getenv('CALLBACK_WORKERS', '4'))  # Concurrent Twilio API calls for callbacks
+CALLBACK_MAX_ATTEMPTS = int(os.getenv('CALLBACK_MAX_ATTEMPTS', '5'))
+CALLBACK_RETRY_SECONDS = float(os.getenv('CALLBACK_RETRY_SECONDS', '30'))  # First retry delay; doubles each attempt
+CALLBACK_RATE_PER_MIN = float(os.getenv('CALLBACK_RATE_PER_MIN', '60'))  # Twilio API sends per minute
+ENABLE_CALL_RECORDING = os.getenv('ENABLE_CALL_RECORDING', 'false').lower() == 'true'  # Record calls and archive the audio
+RECORDING_STORAGE = os.getenv('RECORDING_STORAGE', 'recordings')  # Local directory, or s3://bucket/prefix
+RECORDING_S3_ENDPOINT_URL = os.getenv('RECORDING_S3_ENDPOINT_URL')  # S3-compatible endpoint such as MinIO
+RECORDING_FORMAT = os.getenv('RECORDING_FORMAT', 'wav')  # 'wav' or 'mp3'
+RECORDING_TRANSCRIBE = os.getenv('RECORDING_TRANSCRIBE', 'true').lower() == 'true'  # Twilio transcripts of voicemails
+RECORDING_WORKERS = int(os.getenv('RECORDING_WORKERS', '4'))  # Concurrent recording starts and downloads
+RECORDING_MAX_PENDING = int(os.getenv('RECORDING_MAX_PENDING', '200'))  # Queued recording jobs before new ones are dropped
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')  # Shared dir so /metrics covers every gunicorn worker
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Fraction of requests profiled; 0 disables
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))  # Stack sampling period
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', 'profiles')  # Folded-stack files land here
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')  # Required by /admin endpoints; unset disables them
+VALIDATE_TWILIO_SIGNATURES = os.getenv('VALIDATE_TWILIO_SIGNATURES', 'true').lower() == 'true'  # Needs TWILIO_AUTH_TOKEN
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_CALLER_PER_MIN = float(os.getenv('RATE_LIMIT_CALLER_PER_MIN', '6'))  # /voice + /process_speech per From number
+RATE_LIMIT_CALLER_BURST = int(os.getenv('RATE_LIMIT_CALLER_BURST', '10'))
+RATE_LIMIT_IP_PER_MIN = float(os.getenv('RATE_LIMIT_IP_PER_MIN', '600'))  # Per source IP, only when signatures aren't checked
+RATE_LIMIT_IP_BURST = int(os.getenv('RATE_LIMIT_IP_BURST', '200'))
+RATE_LIMIT_ACTION = os.getenv('RATE_LIMIT_ACTION', 'reject')  # 'reject' or 'forward' (straight to staff)
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', SESSION_REDIS_URL)  # Share limits across workers
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))  # Proxy hops whose X-Forwarded-For is believed
+
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# Background JSON-lines writer for call events (started per worker process)
+call_event_writer = call_events.configure(
+    CALL_EVENT_LOG, level=CALL_EVENT_LEVEL,
+    batch_size=CALL_EVENT_BATCH, flush_interval=CALL_EVENT_FLUSH_SECONDS
+)
+
+# Call lifecycle, turns and forward decisions, written to SQLite off the request path
+call_records = CallRecordStore(CALL_RECORDS_DB).start() if CALL_RECORDS_DB else None
+
+# Prometheus-style metrics served on /metrics
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Webhook latency by route',
+                            ['route', 'method', 'status'])
+CHATBOT_LATENCY = Histogram('chatbot_response_seconds', 'get_chatbot_response latency by answer source',
+                            ['source'])
+INTENTS = Counter('intents_matched_total', 'Transcripts matching each intent', ['intent'])
+FORWARDS = Counter('calls_forwarded_total', 'Calls handed to a human, by reason', ['reason'])
+CALLBACKS = Counter('callback_requests_total', 'Callback requests queued, by intent', ['intent'])
+RECORDINGS = Counter('recordings_total', 'Recording callbacks and archive outcomes', ['kind', 'outcome'])
+FORWARD_OUTCOMES = Counter('forward_dispatch_total', 'Forwarding attempts by outcome', ['outcome'])
+SPEECH_REPAIRS = Counter('speech_repairs_total', 'Transcripts changed by speech normalization, and '
+                         'low-confidence ones kept with the assistant', ['stage', 'outcome'])
+CHATBOT_BREAKER_STATE = Gauge('chatbot_breaker_state', 'Chatbot circuit breaker: 0 closed, 1 half-open, 2 open',
+                              ['tenant', 'endpoint'])
+ERRORS = Counter('errors_total', 'Exceptions caught in routes and the chatbot path', ['where'])
+REJECTED = Counter('webhook_rejected_total', 'Webhooks refused before any work, by reason', ['route', 'reason'])
+if METRICS_MULTIPROC_DIR:
+    REGISTRY.enable_multiprocess(METRICS_MULTIPROC_DIR)
+
+# Abuse throttling for the call-starting webhooks, keyed by caller and source IP
+caller_limiter = make_rate_limiter(RATE_LIMIT_REDIS_URL, RATE_LIMIT_CALLER_PER_MIN, RATE_LIMIT_CALLER_BURST,
+                                   prefix='rate_limit:from:') if RATE_LIMIT_ENABLED else None
+ip_limiter = make_rate_limiter(RATE_LIMIT_REDIS_URL, RATE_LIMIT_IP_PER_MIN, RATE_LIMIT_IP_BURST,
+                               prefix='rate_limit:ip:') if RATE_LIMIT_ENABLED else None
+
+# Sampled stack profiles and stage spans for a fraction of requests
+profiler = Profiler(PROFILE_SAMPLE_RATE, interval=PROFILE_INTERVAL_MS / 1000, output_dir=PROFILE_OUTPUT_DIR)
 
 # Initialize Twilio client
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None
 
-# Keywords that trigger forwarding to owner
+# Opt-in call recording: recordings are started and their audio streamed to
+# storage by a bounded background pool (archive callbacks are defined with the
+# routes below)
+recording_archive = RecordingArchive(
+    make_storage(RECORDING_STORAGE, RECORDING_S3_ENDPOINT_URL),
+    auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None,
+    workers=RECORDING_WORKERS, max_pending=RECORDING_MAX_PENDING, audio_format=RECORDING_FORMAT,
+    on_stored=lambda recording_sid, call_sid, stored: recording_archived(recording_sid, call_sid, stored),
+    on_failed=lambda recording_sid, call_sid, error: recording_archive_failed(recording_sid, call_sid, error)
+) if ENABLE_CALL_RECORDING else None
+
+# Webhook signature check, keyed once from the auth token
+signature_validator = TwilioSignatureValidator(TWILIO_AUTH_TOKEN) \
+    if VALIDATE_TWILIO_SIGNATURES and TWILIO_AUTH_TOKEN else None
+
+# Recent turns of each live call, keyed by CallSid
+call_sessions = make_session_store(
+    SESSION_REDIS_URL, max_turns=SESSION_MAX_TURNS,
+    max_sessions=SESSION_MAX_CALLS, idle_ttl=SESSION_IDLE_TIMEOUT
+)
+
+# Follow-up loop limits, enforced from the server-side session
+conversation_policy = ConversationPolicy(max_turns=MAX_CALL_TURNS, max_seconds=MAX_CALL_SECONDS)
+
+# Chatbot calls running in the background for the filler-then-redirect flow
+pending_answers = PendingAnswers(max_workers=ANSWER_WORKERS)
+
+# TwiML builders; each tenant renders and caches its own copies per knowledge base version
+twiml_templates = TwimlCache()
+
+# Keywords that trigger forwarding to owner. Matching is on whole words (plus a
+# plural "s"), so other inflections the old substring scan caught are listed too.
 FORWARD_KEYWORDS = [
-    'emergency', 'urgent', 'complaint', 'manager', 'owner', 'supervisor',
-    'cancel', 'refund', 'problem', 'issue', 'speak to someone', 'human',
-    'representative', 'billing', 'payment issue'
+    'emergency', 'emergencies', 'urgent', 'urgently', 'complaint', 'complain', 'complained', 'complaining',
+    'manager', 'owner', 'supervisor',
+    'cancel', 'cancelled', 'canceled', 'cancelling', 'canceling', 'cancellation',
+    'refund', 'refunded', 'problem', 'issue', 'speak to someone', 'human',
+    'representative', 'billing', 'billed', 'payment issue'
 ]
 
+# Phrases that end or escalate a follow-up turn
+TRANSFER_PHRASES = ['transfer', 'transferred', 'human', 'person', 'someone', 'representative', 'manager']
+GOODBYE_PHRASES = ['goodbye', 'bye', 'thank you', 'thanks', 'that\'s all', 'nothing else', 'no']
+CALLBACK_PHRASES = ['call me back', 'call back', 'callback', 'have someone call me', 'give me a call']
+
+# Keywords that select a canned answer in get_chatbot_response
+ANSWER_KEYWORDS = {
+    'pricing': ['price', 'priced', 'pricing', 'cost', 'quote', 'quoted', 'estimate', 'how much'],
+    'scheduling': ['schedule', 'scheduled', 'scheduling', 'appointment', 'book', 'booked', 'booking', 'when',
+                   'available'],
+    'services': ['service', 'what do you do', 'lawn', 'window', 'clean', 'cleaned', 'cleaning'],
+    'hours': ['hours', 'open', 'opening', 'contact', 'reach'],
+    'urgent': ['emergency', 'emergencies', 'urgent', 'urgently', 'asap', 'immediately'],
+}
+
+def build_intent_matcher(knowledge_base):
+    """Compile routing phrases plus the knowledge base's answer intents
+
+    Every route then classifies a transcript in a single pass.
+    """
+    return IntentMatcher({
+        'forward': FORWARD_KEYWORDS,
+        'transfer': TRANSFER_PHRASES,
+        'goodbye': GOODBYE_PHRASES,
+        'callback': CALLBACK_PHRASES,
+        **ANSWER_KEYWORDS,
+        **knowledge_base.intents,
+    }, answer_priority=tuple(knowledge_base.answers))
+
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def build_chatbot(tenant_id, config):
+    """Breaker-guarded chatbot backend for a tenant, or None without an API URL"""
+    api_url = config.get('chatbot_api_url', CHATBOT_API_URL)
+    if not api_url:
+        return None
+    chatbot_id = config.get('chatbot_id', CHATBOT_ID)
+    api_key = config.get('chatbot_api_key', CHATBOT_API_KEY)
+    secondary_url = config.get('chatbot_secondary_api_url', CHATBOT_SECONDARY_API_URL)
+    
+    def client(url, key):
+        # Pooled keep-alive client for one backend endpoint
+        return ChatbotClient(url, chatbot_id=chatbot_id, api_key=key,
+                             deadline=CHATBOT_TIMEOUT, pool_size=CHATBOT_POOL_SIZE)
+    
+    def on_state_change(endpoint, state):
+        CHATBOT_BREAKER_STATE.labels(tenant_id, endpoint).set(BREAKER_STATE_VALUES[state])
+    
+    chatbot = ResilientChatbot(
+        client(api_url, api_key),
+        client(secondary_url, config.get('chatbot_secondary_api_key', CHATBOT_SECONDARY_API_KEY or api_key))
+        if secondary_url else None,
+        hedge_after=CHATBOT_HEDGE_AFTER, failure_threshold=CHATBOT_BREAKER_FAILURES,
+        reset_timeout=CHATBOT_BREAKER_RESET_SECONDS, on_state_change=on_state_change,
+        max_workers=CHATBOT_POOL_SIZE
+    )
+    for endpoint in ('primary', 'secondary') if secondary_url else ('primary',):
+        on_state_change(endpoint, CLOSED)
+    return chatbot
+
+def build_dispatcher(config, owner_phone):
+    """Dispatcher over the tenant's staff numbers (just the owner by default), or None without any"""
+    numbers = config.get('forward_numbers', FORWARD_NUMBERS) or ([owner_phone] if owner_phone else [])
+    if not numbers:
+        return None
+    return ForwardingDispatcher(numbers, strategy=config.get('forward_strategy', FORWARD_STRATEGY),
+                                max_calls=config.get('forward_max_calls', FORWARD_MAX_CALLS))
+
+def build_tenant(config):
+    """Tenant from a tenants file entry; settings it leaves out come from the environment"""
+    tenant_id = config.get('id', 'default')
+    owner_phone = config.get('owner_phone', OWNER_PHONE)
+    tenant = Tenant(
+        tenant_id, config.get('numbers', ()),
+        business_name=config.get('business_name', BUSINESS_NAME),
+        owner_phone=owner_phone,
+        chatbot_id=config.get('chatbot_id', CHATBOT_ID),
+        chatbot=build_chatbot(tenant_id, config),
+        # Staff numbers escalated calls are spread across
+        dispatcher=build_dispatcher(config, owner_phone),
+        # Answers keyed on normalized utterances, so repeat questions skip the backend
+        answer_cache=AnswerCache(max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL),
+        twiml=twiml_templates,
+        build_intent_matcher=build_intent_matcher,
+    )
+    tenant.load_knowledge_base(config.get('knowledge_base', KNOWLEDGE_BASE_PATH))
+    return tenant
+
+def load_tenants():
+    """The environment-configured business plus any from TENANTS_FILE"""
+    configs = tenants.load_configs(TENANTS_FILE) if TENANTS_FILE else []
+    registry = TenantRegistry(build_tenant({}), [build_tenant(config) for config in configs])
+    return registry.start_watching(KNOWLEDGE_BASE_POLL_SECONDS)
+
+def current_tenant():
+    """Tenant resolved for the current request, or the default outside one"""
+    if has_app_context():
+        return g.get('tenant') or tenant_registry.default
+    return tenant_registry.default
+
+def current_knowledge():
+    """The request's knowledge snapshot, or the default tenant's current one outside a request"""
+    if has_app_context() and g.get('knowledge'):
+        return g.knowledge
+    return current_tenant().knowledge
+
+# Every business served here, indexed by its Twilio numbers; knowledge base
+# edits are picked up without a restart
+tenant_registry = load_tenants()
+
+# Promised callbacks, persisted and sent to staff by a background worker pool
+# (notify_callback is defined with the routes below)
+callback_queue = CallbackQueue(
+    CALLBACKS_DB, notify=lambda callback: notify_callback(callback), workers=CALLBACK_WORKERS,
+    max_attempts=CALLBACK_MAX_ATTEMPTS, retry_delay=CALLBACK_RETRY_SECONDS, rate_per_minute=CALLBACK_RATE_PER_MIN
+).start() if CALLBACKS_DB else None
+
+@twiml_templates.register('greeting')
+def greeting_twiml(knowledge):
+    """Greeting and speech gather for a new call"""
+    response = VoiceResponse()
+    
+    # Greet the caller and start gathering speech
+    gather = response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/process_speech',
+        method='POST',
+        speech_timeout='auto',
+        timeout=10,
+        language='en-US',
+        hints=', '.join(knowledge.knowledge_base.hints)
+    )
+    
+    if recording_archive:
+        gather.say("This call may be recorded.", voice='Polly.Joanna', language='en-US')
+    gather.say(
+        knowledge.knowledge_base.greeting,
+        voice='Polly.Joanna',
+        language='en-US'
+    )
+    
+    # Fallback if no speech detected
+    response.say(
+        "I didn't hear anything. Let me transfer you to our team.",
+        voice='Polly.Joanna'
+    )
+    response.redirect(f"{WEBHOOK_BASE_URL}/forward?{urlencode({'reason': 'no_speech'})}", method='POST')
+    return response
+
+@twiml_templates.register('low_confidence')
+def low_confidence_twiml(knowledge):
+    """Transfer when speech was missing or unclear"""
+    response = VoiceResponse()
+    response.say(
+        "I'm sorry, I didn't catch that clearly. Let me transfer you to our team for better assistance.",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@twiml_templates.register('forward')
+def forward_twiml(knowledge):
+    """Immediate transfer when forwarding keywords were spoken"""
+    response = VoiceResponse()
+    response.say(
+        "I understand you need to speak with someone from our team. Let me connect you right away.",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@twiml_templates.register('rate_limited_call')
+def rate_limited_call_twiml(knowledge):
+    """Refuse a new call from a throttled caller; rejected calls aren't billed"""
+    response = VoiceResponse()
+    response.reject(reason='busy')
+    return response
+
+@twiml_templates.register('rate_limited')
+def rate_limited_twiml(knowledge):
+    """End a throttled call that is already connected"""
+    response = VoiceResponse()
+    response.say("We're receiving too many requests right now. Please try again later. Goodbye!",
+                 voice='Polly.Joanna')
+    response.hangup()
+    return response
+
+@twiml_templates.register('dispatch')
+def dispatch_twiml(knowledge):
+    """Nothing to say first; the dispatch verbs are appended (e.g. rate-limited callers go straight to staff)"""
+    return VoiceResponse()
+
+@twiml_templates.register('followup_prompt')
+def followup_prompt_twiml(knowledge):
+    """Gather for another question; the answer Say is spliced in front"""
+    response = VoiceResponse()
+    
+    # Ask for follow-up
+    gather = response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/process_followup',
+        method='POST',
+        speech_timeout='auto',
+        timeout=8,
+        language='en-US'
+    )
+    gather.say(
+        "Is there anything else I can help you with? You can also say 'transfer me' to speak with our team.",
+        voice='Polly.Joanna'
+    )
+    
+    # Fallback
+    response.say("Thank you for calling. Have a great day!", voice='Polly.Joanna')
+    return response
+
+@twiml_templates.register('chatbot_unavailable')
+def chatbot_unavailable_twiml(knowledge):
+    """Transfer when the chatbot couldn't answer the first question"""
+    response = VoiceResponse()
+    response.say(
+        "I'm having trouble processing your request right now. Let me connect you with our team.",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@twiml_templates.register('transfer')
+def transfer_twiml(knowledge):
+    """Transfer requested during a follow-up"""
+    response = VoiceResponse()
+    response.say("Of course! Let me connect you with our team right away.", voice='Polly.Joanna')
+    return response
+
+@twiml_templates.register('queue_wait')
+def queue_wait_twiml(knowledge):
+    """Hold loop for callers waiting on a free staff member"""
+    response = VoiceResponse()
+    response.say("Everyone on our team is on another call. Please stay on the line and we'll be right with you.",
+                 voice='Polly.Joanna')
+    response.pause(length=15)
+    return response
+
+@twiml_templates.register('queue_leave')
+def queue_leave_twiml(knowledge):
+    """Take the caller out of the hold queue; the Enqueue action decides what's next"""
+    response = VoiceResponse()
+    response.leave()
+    return response
+
+@twiml_templates.register('callback_recorded')
+def callback_recorded_twiml(knowledge):
+    """Close the call after a callback message"""
+    response = VoiceResponse()
+    response.say("Thank you. Someone from our team will call you back as soon as possible. Goodbye!",
+                 voice='Polly.Joanna')
+    response.hangup()
+    return response
+
+@twiml_templates.register('hangup')
+def hangup_twiml(knowledge):
+    """End the call once a forwarded conversation is over"""
+    response = VoiceResponse()
+    response.hangup()
+    return response
+
+@twiml_templates.register('closing')
+def closing_twiml(knowledge):
+    """End of the conversation loop; the last answer Say is spliced in front"""
+    response = VoiceResponse()
+    response.say(
+        f"Thank you for calling {knowledge.knowledge_base.business_name}. If you need further assistance, please call us back. Goodbye!",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@twiml_templates.register('goodbye')
+def goodbye_twiml(knowledge):
+    """Closing message when the caller is done"""
+    response = VoiceResponse()
+    response.say(
+        f"Thank you for calling {knowledge.knowledge_base.business_name}! Have a wonderful day!",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@twiml_templates.register('test_tts')
+def test_tts_twiml(knowledge):
+    """Text-to-speech check"""
+    response = VoiceResponse()
+    response.say(
+        f"This is a test of the {knowledge.knowledge_base.business_name} AI phone system. Text-to-speech is working correctly.",
+        voice='Polly.Joanna'
+    )
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiled = profiler.begin_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@app.after_request
+def observe_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(time.perf_counter() - started)
+    return response
+
+# Webhooks Twilio calls; everything else (health, metrics, browser GETs) is unsigned
+SIGNED_ENDPOINTS = frozenset({'handle_incoming_call', 'process_speech', 'process_followup',
+                              'answer_ready', 'call_status', 'forward_call', 'forward_wait',
+                              'callback_request', 'recording_status'})
+
+@app.before_request
+def validate_twilio_signature():
+    """Refuse unsigned or forged webhooks before any TwiML or chatbot work"""
+    if signature_validator is None or request.method != 'POST' or request.endpoint not in SIGNED_ENDPOINTS:
+        return None
+    signature = request.headers.get('X-Twilio-Signature')
+    if signature_validator.validate(signed_url(), request.form, signature):
+        return None
+    REJECTED.labels(request.url_rule.rule, 'missing_signature' if not signature else 'bad_signature').inc()
+    return Response('Invalid signature', status=403, mimetype='text/plain')
+
+@app.before_request
+def resolve_tenant():
+    """Pick the business this webhook is for from the number that was called
+
+    g.knowledge snapshots the tenant's knowledge base and everything built from
+    it, so the whole request sees one version even if a reload lands mid-request.
+    """
+    if request.method == 'POST':
+        g.tenant = tenant_registry.resolve(request.form.get('To'))
+    else:
+        g.tenant = tenant_registry.default
+    g.knowledge = g.tenant.knowledge
+
+# Webhooks that start or drive an AI turn; throttled per caller, and per source IP
+# when signatures aren't validated (signed traffic is Twilio's, often via one proxy IP)
+RATE_LIMITED_ENDPOINTS = frozenset({'handle_incoming_call', 'process_speech'})
+
+@app.before_request
+def enforce_rate_limits():
+    """Answer over-limit callers from pre-rendered TwiML without touching the chatbot"""
+    if caller_limiter is None or request.method != 'POST' or request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    caller = request.form.get('From')
+    if caller and not caller_limiter.allow(caller):
+        reason = 'rate_limited_caller'
+    elif signature_validator is None and not ip_limiter.allow(request.remote_addr or 'unknown'):
+        reason = 'rate_limited_ip'
+    else:
+        return None
+    REJECTED.labels(request.url_rule.rule, reason).inc()
+    logger.warning(f"Rate limited {request.url_rule.rule} from {caller} / {request.remote_addr}")
+    if RATE_LIMIT_ACTION == 'forward' and g.tenant.dispatcher:
+        record_forward(request.form.get('CallSid'), reason)
+        return forward_response('dispatch', request.form.get('CallSid'))
+    if request.endpoint == 'handle_incoming_call':
+        return g.knowledge.twiml.response('rate_limited_call')
+    return g.knowledge.twiml.response('rate_limited')
+
+def signed_url():
+    """The URL Twilio signed: the public WEBHOOK_BASE_URL behind proxies, else what we received"""
+    if not WEBHOOK_BASE_URL:
+        return request.url
+    query = request.query_string.decode('utf-8')
+    return WEBHOOK_BASE_URL.rstrip('/') + request.path + (f'?{query}' if query else '')
+
+@app.teardown_request
+def finish_request_profile(exc):
+    if g.get('profiled'):
+        profiler.end_request()
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint"""
     return {
         'status': 'AI Phone Integration Active',
-        'business': BUSINESS_NAME,
+        'business': g.knowledge.knowledge_base.business_name,
         'endpoints': {
             'voice': '/voice (POST)',
             'health': '/health (GET)',
+            'metrics': '/metrics (GET)',
             'test_tts': '/test_tts (GET)'
         },
         'timestamp': datetime.now().isoformat()
@@ -62,46 +596,29 @@ def handle_incoming_call():
         # Get caller information
         caller_number = request.form.get('From', 'Unknown')
         called_number = request.form.get('To', 'Unknown')
+        call_sid = request.form.get('CallSid')
         
-        logger.info(f"Incoming call from {caller_number} to {called_number}")
-        
-        # Create TwiML response
-        response = VoiceResponse()
+        call_events.emit(call_events.CALL_STARTED, call_sid=call_sid, caller=caller_number, called=called_number)
         
-        # Greet the caller and start gathering speech
-        gather = response.gather(
-            input='speech',
-            action=f'{WEBHOOK_BASE_URL}/process_speech',
-            method='POST',
-            speech_timeout='auto',
-            timeout=10,
-            language='en-US',
-            hints='lawn care, window washing, cleaning, appointment, quote, pricing'
-        )
-        
-        gather.say(
-            f"Hello! Thank you for calling {BUSINESS_NAME}. "
-            "I'm your AI assistant. How can I help you today? "
-            "Please speak clearly after the tone.",
-            voice='Polly.Joanna',
-            language='en-US'
-        )
-        
-        # Fallback if no speech detected
-        response.say(
-            "I didn't hear anything. Let me transfer you to our team.",
-            voice='Polly.Joanna'
-        )
-        response.dial(OWNER_PHONE)
+        if call_sid:
+            with profiler.span('session'):
+                call_sessions.get_or_create(call_sid, caller_number)
+            if call_records:
+                call_records.call_started(call_sid, caller_number, called_number)
+            if recording_archive and twilio_client:
+                # A Twilio API call, so it runs on the recording pool
+                recording_archive.start(call_sid, start_call_recording)
         
-        return Response(str(response), mimetype='text/xml')
+        with profiler.span('render_twiml'):
+            return g.knowledge.twiml.response('greeting')
         
     except Exception as e:
         logger.error(f"Error in handle_incoming_call: {str(e)}")
+        ERRORS.labels('handle_incoming_call').inc()
         response = VoiceResponse()
         response.say("I'm sorry, there's a technical issue. Let me transfer you to our team.")
-        if OWNER_PHONE:
-            response.dial(OWNER_PHONE)
+        for verb in forward_verbs(request.form.get('CallSid')):
+            response.append(verb)
         return Response(str(response), mimetype='text/xml')
 
 @app.route('/process_speech', methods=['POST'])
@@ -112,71 +629,55 @@ def process_speech():
         speech_result = request.form.get('SpeechResult', '').strip()
         confidence = float(request.form.get('Confidence', 0))
         caller_number = request.form.get('From', 'Unknown')
+        call_sid = request.form.get('CallSid')
         
-        logger.info(f"Speech from {caller_number}: '{speech_result}' (confidence: {confidence})")
+        with profiler.span('normalize'):
+            speech_result = normalize_speech(speech_result, confidence, call_sid, caller_number, 'speech')
+        if not speech_result:
+            record_forward(call_sid, 'low_confidence')
+            return forward_response('low_confidence', call_sid)
         
-        response = VoiceResponse()
+        with profiler.span('classify'):
+            intent_match = g.knowledge.intent_matcher.classify(speech_result)
+        emit_intents(call_sid, intent_match)
         
-        # Check if speech was captured with reasonable confidence
-        if not speech_result or confidence < 0.3:
-            response.say(
-                "I'm sorry, I didn't catch that clearly. Let me transfer you to our team for better assistance.",
-                voice='Polly.Joanna'
-            )
-            if OWNER_PHONE:
-                response.dial(OWNER_PHONE)
-            return Response(str(response), mimetype='text/xml')
+        # Unclear speech goes to a human unless it's a question we can answer as heard (lexicon fixes only)
+        if confidence < SPEECH_MIN_CONFIDENCE:
+            if not is_answerable(speech_result, intent_match):
+                record_forward(call_sid, 'low_confidence')
+                return forward_response('low_confidence', call_sid)
+            SPEECH_REPAIRS.labels('speech', 'rescued').inc()
         
         # Check for keywords that should trigger immediate forwarding
-        if should_forward_to_owner(speech_result):
-            logger.info(f"Forwarding call due to keywords in: {speech_result}")
-            response.say(
-                "I understand you need to speak with someone from our team. Let me connect you right away.",
-                voice='Polly.Joanna'
-            )
-            response.dial(OWNER_PHONE)
-            return Response(str(response), mimetype='text/xml')
+        if 'forward' in intent_match.intents:
+            record_forward(call_sid, 'keywords', intent_match.phrases['forward'])
+            return forward_response('forward', call_sid)
+        
+        request_callback(call_sid, caller_number, intent_match, speech_result)
         
         # Get AI response from Abacus.ai ChatLLM
-        ai_response = get_chatbot_response(speech_result, caller_number)
+        with profiler.span('session'):
+            history = call_sessions.history(call_sid) if call_sid else None
+        deferred = defer_answer('speech', CONTINUE, call_sid, speech_result, caller_number, intent_match, history)
+        if deferred:
+            return deferred
         
-        if ai_response:
-            # Speak the AI response
-            response.say(ai_response, voice='Polly.Joanna', language='en-US')
-            
-            # Ask for follow-up
-            gather = response.gather(
-                input='speech',
-                action=f'{WEBHOOK_BASE_URL}/process_followup',
-                method='POST',
-                speech_timeout='auto',
-                timeout=8,
-                language='en-US'
-            )
-            gather.say(
-                "Is there anything else I can help you with? You can also say 'transfer me' to speak with our team.",
-                voice='Polly.Joanna'
-            )
-            
-            # Fallback
-            response.say("Thank you for calling. Have a great day!", voice='Polly.Joanna')
-        else:
-            # Fallback to human if AI fails
-            response.say(
-                "I'm having trouble processing your request right now. Let me connect you with our team.",
-                voice='Polly.Joanna'
-            )
-            if OWNER_PHONE:
-                response.dial(OWNER_PHONE)
+        with profiler.span('chatbot'):
+            ai_response = get_chatbot_response(speech_result, caller_number, intent_match, history)
+        with profiler.span('record'):
+            record_turns(call_sid, caller_number, speech_result, ai_response, 'speech', intent_match)
         
-        return Response(str(response), mimetype='text/xml')
+        # Speak the AI response and ask for follow-up, or fall back to a human
+        with profiler.span('render_twiml'):
+            return answer_response(ai_response, 'speech')
         
     except Exception as e:
         logger.error(f"Error in process_speech: {str(e)}")
+        ERRORS.labels('process_speech').inc()
         response = VoiceResponse()
         response.say("I'm experiencing technical difficulties. Let me transfer you to our team.")
-        if OWNER_PHONE:
-            response.dial(OWNER_PHONE)
+        for verb in forward_verbs(request.form.get('CallSid')):
+            response.append(verb)
         return Response(str(response), mimetype='text/xml')
 
 @app.route('/process_followup', methods=['POST'])
@@ -184,99 +685,479 @@ def process_followup():
     """Handle follow-up questions"""
     try:
         speech_result = request.form.get('SpeechResult', '').strip()
+        confidence = float(request.form.get('Confidence', 0))
         caller_number = request.form.get('From', 'Unknown')
+        call_sid = request.form.get('CallSid')
         
-        logger.info(f"Follow-up from {caller_number}: '{speech_result}'")
-        
-        response = VoiceResponse()
+        speech_result = normalize_speech(speech_result, confidence, call_sid, caller_number, 'followup')
+        intent_match = g.knowledge.intent_matcher.classify(speech_result)
+        emit_intents(call_sid, intent_match)
+        session = call_sessions.get(call_sid) if call_sid else None
+        step = conversation_policy.next_step(intent_match, session, has_speech=bool(speech_result))
         
         # Check for transfer requests
-        transfer_phrases = ['transfer', 'human', 'person', 'someone', 'representative', 'manager']
-        if any(phrase in speech_result.lower() for phrase in transfer_phrases):
-            response.say("Of course! Let me connect you with our team right away.", voice='Polly.Joanna')
-            if OWNER_PHONE:
-                response.dial(OWNER_PHONE)
-            return Response(str(response), mimetype='text/xml')
+        if step == TRANSFER:
+            record_forward(call_sid, 'transfer_requested', intent_match.phrases['transfer'])
+            return forward_response('transfer', call_sid)
         
         # Check for goodbye/ending phrases
-        goodbye_phrases = ['goodbye', 'bye', 'thank you', 'thanks', 'that\'s all', 'nothing else', 'no']
-        if any(phrase in speech_result.lower() for phrase in goodbye_phrases):
-            response.say(
-                f"Thank you for calling {BUSINESS_NAME}! Have a wonderful day!",
-                voice='Polly.Joanna'
-            )
-            return Response(str(response), mimetype='text/xml')
+        if step == GOODBYE:
+            return g.knowledge.twiml.response('goodbye')
         
         # Process additional question
+        ai_response = None
         if speech_result:
-            ai_response = get_chatbot_response(speech_result, caller_number)
-            if ai_response:
-                response.say(ai_response, voice='Polly.Joanna')
-        
-        # End the call gracefully
-        response.say(
-            f"Thank you for calling {BUSINESS_NAME}. If you need further assistance, please call us back. Goodbye!",
-            voice='Polly.Joanna'
-        )
+            request_callback(call_sid, caller_number, intent_match, speech_result)
+            history = session.history() if session else None
+            deferred = defer_answer('followup', step, call_sid, speech_result, caller_number, intent_match, history)
+            if deferred:
+                return deferred
+            ai_response = get_chatbot_response(speech_result, caller_number, intent_match, history)
+            record_turns(call_sid, caller_number, speech_result, ai_response, 'followup', intent_match)
         
-        return Response(str(response), mimetype='text/xml')
+        # Keep the conversation going until the turn or time budget runs out,
+        # otherwise end the call gracefully
+        return answer_response(ai_response, 'followup', step)
         
     except Exception as e:
         logger.error(f"Error in process_followup: {str(e)}")
+        ERRORS.labels('process_followup').inc()
         response = VoiceResponse()
         response.say("Thank you for calling. Goodbye!")
         return Response(str(response), mimetype='text/xml')
 
-def get_chatbot_response(user_message, caller_number):
-    """Get response from Abacus.ai ChatLLM"""
+@app.route('/answer_ready', methods=['POST'])
+def answer_ready():
+    """Poll for a chatbot answer started by defer_answer"""
+    stage = request.args.get('stage', 'speech')
+    step = request.args.get('step', CONTINUE)
+    speech_result = request.args.get('speech', '')
+    attempt = int(request.args.get('attempt', 0))
+    said = int(request.args.get('said', 0))
+    call_sid = request.form.get('CallSid')
+    caller_number = request.form.get('From', 'Unknown')
+    
     try:
-        # Since we don't have direct API access, we'll simulate the chatbot response
-        # In a real implementation, you would make an HTTP request to the Abacus.ai API
-        
-        # For now, provide intelligent responses based on common lawn care queries
-        user_message_lower = user_message.lower()
-        
-        # Pricing inquiries
-        if any(word in user_message_lower for word in ['price', 'cost', 'quote', 'estimate', 'how much']):
-            return ("I'd be happy to help with pricing information. Our lawn care services start at $50 per visit, "
-                   "and window washing varies by home size. For an accurate quote, I can have our team call you back "
-                   "within 2 hours, or you can schedule a free estimate on our website.")
-        
-        # Scheduling
-        elif any(word in user_message_lower for word in ['schedule', 'appointment', 'book', 'when', 'available']):
-            return ("I can help you schedule service! We're typically available Monday through Saturday. "
-                   "Our next available slots are this week. Would you like me to have someone call you back "
-                   "to schedule, or would you prefer to book online?")
-        
-        # Services
-        elif any(word in user_message_lower for word in ['service', 'what do you do', 'lawn', 'window', 'clean']):
-            return ("We provide professional lawn care including mowing, edging, and trimming, plus residential "
-                   "and commercial window washing. We serve the local area with reliable, quality service. "
-                   "What specific service are you interested in?")
-        
-        # Hours/Contact
-        elif any(word in user_message_lower for word in ['hours', 'open', 'contact', 'reach']):
-            return ("We're available Monday through Saturday, 8 AM to 6 PM. You can reach us anytime at this number, "
-                   "or visit our website. For urgent matters, I can connect you with our team right now.")
-        
-        # Emergency/Urgent
-        elif any(word in user_message_lower for word in ['emergency', 'urgent', 'asap', 'immediately']):
-            return ("I understand this is urgent. Let me connect you directly with our team who can help you immediately.")
-        
-        # Default response
+        status, ai_response = pending_answers.poll(call_sid)
+        
+        if status == PENDING:
+            # Still streaming: say the sentences that arrived since the last poll
+            sentences = ai_response
+            if attempt < max_answer_polls():
+                return answer_wait_response(stage, step, speech_result, attempt + 1, sentences[said:], len(sentences))
+            logger.warning("Gave up waiting for chatbot answer on call %s", call_sid)
+            pending_answers.discard(call_sid)
+            ai_response = ' '.join(sentences) if sentences else None
+        elif status == MISSING:
+            # Submitted on another worker (or this one restarted); answer inline
+            history = call_sessions.history(call_sid) if call_sid else None
+            ai_response = get_chatbot_response(speech_result, caller_number, None, history)
+            said = 0
+        
+        record_turns(call_sid, caller_number, speech_result, ai_response, stage)
+        return answer_response(ai_response, stage, step, said)
+        
+    except Exception as e:
+        logger.error(f"Error in answer_ready: {str(e)}")
+        ERRORS.labels('answer_ready').inc()
+        return answer_response(None, stage, step)
+
+def answer_response(ai_response, stage, step=CONTINUE, said=0):
+    """TwiML for a finished chatbot answer at the given stage of the call
+
+    said counts the answer's leading sentences already spoken while it streamed.
+    """
+    if ai_response:
+        remaining = ' '.join(SENTENCE_END.split(ai_response)[said:]) if said else ai_response
+        verbs = [Say(remaining, voice='Polly.Joanna', language='en-US')] if remaining else []
+        if step == CONTINUE:
+            return g.knowledge.twiml.response_with('followup_prompt', *verbs)
+        return g.knowledge.twiml.response_with('closing', *verbs)
+    if stage == 'speech':
+        call_sid = request.form.get('CallSid')
+        record_forward(call_sid, 'chatbot_unavailable')
+        return forward_response('chatbot_unavailable', call_sid)
+    return g.knowledge.twiml.response('closing')
+
+def defer_answer(stage, step, call_sid, speech_result, caller_number, intent_match, history):
+    """Start the chatbot call in the background and return filler TwiML
+
+    Returns None when the answer should be produced inline instead: async
+    mode is off, there's no backend or CallSid, the answer is already
+    cached or in the FAQ, or the background pool is saturated.
+    """
+    tenant = g.tenant
+    if not (ASYNC_ANSWERS and tenant.chatbot and call_sid):
+        return None
+    if cached_chatbot_answer(speech_result, tenant, history) is not None:
+        return None
+    if g.knowledge.faq_index and g.knowledge.faq_index.match(speech_result, FAQ_MIN_SCORE):
+        return None
+    if not pending_answers.submit(
+        call_sid, get_chatbot_response, speech_result, caller_number, intent_match, history, tenant, g.knowledge,
+        stream=True
+    ):
+        return None
+    
+    response = VoiceResponse()
+    response.say("One moment while I look that up.", voice='Polly.Joanna')
+    response.pause(length=ANSWER_POLL_SECONDS)
+    response.redirect(answer_ready_url(stage, step, speech_result, 0), method='POST')
+    return Response(str(response), mimetype='text/xml')
+
+def answer_wait_response(stage, step, speech_result, attempt, sentences=(), said=0):
+    """Say newly streamed sentences (or pause if there are none), then poll again"""
+    response = VoiceResponse()
+    if sentences:
+        response.say(' '.join(sentences), voice='Polly.Joanna', language='en-US')
+    else:
+        response.pause(length=ANSWER_POLL_SECONDS)
+    response.redirect(answer_ready_url(stage, step, speech_result, attempt, said), method='POST')
+    return Response(str(response), mimetype='text/xml')
+
+def answer_ready_url(stage, step, speech_result, attempt, said=0):
+    query = urlencode({'stage': stage, 'step': step, 'speech': speech_result, 'attempt': attempt, 'said': said})
+    return f'{WEBHOOK_BASE_URL}/answer_ready?{query}'
+
+def max_answer_polls():
+    """Enough polls to cover the chatbot deadline plus a little slack"""
+    return int(CHATBOT_TIMEOUT / max(ANSWER_POLL_SECONDS, 1)) + 2
+
+def normalize_speech(speech_result, confidence, call_sid, caller_number, stage):
+    """Repair likely misrecognitions in a transcript and log what was heard
+
+    Below SPEECH_MIN_CONFIDENCE only the lexicon applies: guessing words in
+    speech that unclear invents questions ("parking" -> "pricing") that would
+    keep the caller from a person and queue callbacks nobody asked for.
+    """
+    fuzzy_below = SPEECH_REPAIR_CONFIDENCE if confidence >= SPEECH_MIN_CONFIDENCE else 0
+    repair = g.knowledge.speech_normalizer.repair(speech_result, confidence, fuzzy_below)
+    repaired = {}
+    if repair.corrections:
+        SPEECH_REPAIRS.labels(stage, 'repaired').inc()
+        repaired = {'repaired': repair.text, 'corrections': repair.corrections}
+    call_events.emit(call_events.SPEECH_RECEIVED, call_sid=call_sid, caller=caller_number, stage=stage,
+                     transcript=speech_result, confidence=confidence, **repaired)
+    return repair.text
+
+def is_answerable(speech_result, intent_match):
+    """True if a transcript names a known question: an answer intent or an FAQ hit"""
+    knowledge = g.knowledge
+    if knowledge.intent_matcher.answer_intent(intent_match) is not None:
+        return True
+    return bool(knowledge.faq_index and knowledge.faq_index.match(speech_result, FAQ_MIN_SCORE))
+
+def request_callback(call_sid, caller_number, intent_match, speech_result):
+    """Queue a callback if the caller asked for one or the answer will promise one"""
+    if callback_queue is None or not caller_number.startswith('+'):
+        return
+    tenant = g.tenant
+    knowledge = g.knowledge
+    intent = 'callback' if 'callback' in intent_match.intents else knowledge.intent_matcher.answer_intent(intent_match)
+    if intent != 'callback' and intent not in knowledge.knowledge_base.callback_intents:
+        return
+    callback_queue.request(caller_number, tenant.tenant_id, call_sid, request.form.get('To'), intent, speech_result)
+    CALLBACKS.labels(intent).inc()
+
+def notify_callback(callback):
+    """Tell staff about a callback request (runs on a callback worker thread)"""
+    tenant = tenant_registry.resolve(callback['called'])
+    staff = tenant.dispatcher.numbers[0] if tenant.dispatcher else tenant.owner_phone
+    if not staff:
+        raise CallbackRejected(f"tenant {tenant.tenant_id} has no staff number")
+    if twilio_client is None:
+        raise RuntimeError("Twilio credentials are not configured")
+    about = f" about {callback['intent']}" if callback['intent'] not in (None, 'callback', 'voicemail') else ''
+    try:
+        if CALLBACK_NOTIFY == 'call':
+            # Ring staff, read out the request, then connect them to the caller
+            response = VoiceResponse()
+            response.say(f"Callback request from {' '.join(callback['caller'].lstrip('+'))}{about}. "
+                         f"Connecting you now.", voice='Polly.Joanna')
+            response.dial(callback['caller'], caller_id=callback['called'])
+            twilio_client.calls.create(to=staff, from_=callback['called'], twiml=str(response))
         else:
-            return ("Thank you for your question about our lawn care and window washing services. "
-                   "I want to make sure you get the best answer. Would you like me to connect you with "
-                   "our team for detailed assistance, or is there something specific I can help with?")
+            said = f": \"{callback['transcript']}\"" if callback['transcript'] else ''
+            recording = f" Message: {callback['recording_url']}" if callback['recording_url'] else ''
+            twilio_client.messages.create(
+                to=staff, from_=callback['called'],
+                body=f"{tenant.knowledge_base.business_name}: please call back {callback['caller']}{about}{said}."
+                     f"{recording}")
+    except TwilioRestException as e:
+        # Throttling and server errors are worth retrying; anything else won't change
+        if e.status == 429 or e.status >= 500:
+            raise
+        raise CallbackRejected(e.msg) from e
+
+def emit_intents(call_sid, intent_match):
+    """Record which intents and phrases a transcript matched"""
+    for intent in intent_match.intents:
+        INTENTS.labels(intent).inc()
+    if intent_match.intents:
+        call_events.emit(call_events.INTENT_MATCHED, call_sid=call_sid,
+                         intents=sorted(intent_match.intents), phrases=intent_match.phrases)
+
+def record_forward(call_sid, reason, phrases=None):
+    """Log and persist a decision to hand the call to a human"""
+    call_events.emit(call_events.FORWARDED, call_sid=call_sid, reason=reason, phrases=phrases)
+    FORWARDS.labels(reason).inc()
+    if call_records and call_sid:
+        call_records.forwarded(call_sid, reason)
+
+def record_turns(call_sid, caller_number, speech_result, ai_response, stage, intent_match=None):
+    """Append the caller's utterance and our answer to the call session and record"""
+    if not call_sid:
+        return
+    if call_records:
+        intents = intent_match.intents if intent_match else ()
+        call_records.turn(call_sid, stage, speech_result, intents, ai_response)
+    call_sessions.record_turn(call_sid, 'caller', speech_result, caller_number)
+    if ai_response:
+        call_sessions.record_turn(call_sid, 'assistant', ai_response)
+
+def get_chatbot_response(user_message, caller_number, intent_match=None, history=None, tenant=None,
+                         knowledge=None, on_sentence=None):
+    """Get response from Abacus.ai ChatLLM; on_sentence receives a backend reply's sentences as they stream
+
+    knowledge is the snapshot intent_match was classified with (the request's by default).
+    """
+    if tenant is None:
+        tenant, knowledge = current_tenant(), knowledge or current_knowledge()
+    elif knowledge is None:
+        knowledge = tenant.knowledge
+    started = time.perf_counter()
+    source = 'canned'
+    try:
+        # Questions the FAQ covers are answered locally, without a backend round-trip
+        faq_match = knowledge.faq_index.match(user_message, FAQ_MIN_SCORE) if knowledge.faq_index else None
+        if faq_match:
+            source = 'faq'
+            return faq_match.answer
+        
+        # Use the real ChatLLM backend when one is configured
+        if tenant.chatbot:
+            source = 'cache'
+            answer = cached_chatbot_answer(user_message, tenant, history)
+            if answer is not None:
+                return answer
+            answer, endpoint = tenant.chatbot.complete(user_message, caller_number, history, on_sentence=on_sentence)
+            if answer:
+                source = 'backend' if endpoint == 'primary' else 'backend_secondary'
+                # Answers shaped by earlier turns, or cut off by the deadline, aren't reusable
+                if not history and not getattr(answer, 'truncated', False):
+                    tenant.answer_cache.put(normalize_utterance(user_message, stem=ANSWER_CACHE_STEM), answer)
+                return answer
             
+            # Backend down or open: a looser FAQ match, then the canned answer for a
+            # recognized intent, and otherwise None so the caller reaches the owner
+            faq_match = knowledge.faq_index.match(user_message, FAQ_FALLBACK_MIN_SCORE) if knowledge.faq_index else None
+            if faq_match:
+                source = 'fallback_faq'
+                return faq_match.answer
+            if intent_match is None:
+                intent_match = knowledge.intent_matcher.classify(user_message)
+            intent = knowledge.intent_matcher.answer_intent(intent_match)
+            if intent in knowledge.knowledge_base.answers:
+                source = 'fallback_canned'
+                return knowledge.knowledge_base.answers[intent]
+            source = 'backend_breaker_open' if endpoint == BREAKER_OPEN else 'backend_failed'
+            return None
+        
+        # Otherwise answer from the knowledge base's canned answers
+        if intent_match is None:
+            intent_match = knowledge.intent_matcher.classify(user_message)
+        intent = knowledge.intent_matcher.answer_intent(intent_match)
+        return knowledge.knowledge_base.answers.get(intent, knowledge.knowledge_base.default_answer)
+        
     except Exception as e:
         logger.error(f"Error getting chatbot response: {str(e)}")
+        ERRORS.labels('get_chatbot_response').inc()
+        source = 'error'
         return None
+    finally:
+        CHATBOT_LATENCY.labels(source).observe(time.perf_counter() - started)
+
+def cached_chatbot_answer(user_message, tenant=None, history=None):
+    """Return a cached backend answer for this utterance, if any
+
+    Only opening questions are cached: a follow-up's answer depends on the
+    turns before it.
+    """
+    if history:
+        return None
+    return (tenant or current_tenant()).answer_cache.get(normalize_utterance(user_message, stem=ANSWER_CACHE_STEM))
+
+def forward_verbs(call_sid, tried=()):
+    """Ring a free staff number, else hold for one or take a callback message
+
+    tried holds numbers already rung for this call without an answer; once
+    it's non-empty nobody is reachable, so the caller isn't put on hold.
+    """
+    tenant = g.tenant
+    dispatcher = tenant.dispatcher
+    number = dispatcher.claim(call_sid, exclude=tried) if dispatcher and call_sid else None
+    if number:
+        FORWARD_OUTCOMES.labels('dialed').inc()
+        return [dial_verb(number, tried)]
+    if dispatcher and call_sid and not tried and FORWARD_WHEN_BUSY == 'queue':
+        FORWARD_OUTCOMES.labels('queued').inc()
+        dispatcher.hold(call_sid)
+        return [Enqueue(f'forward-{tenant.tenant_id}', action=f'{WEBHOOK_BASE_URL}/forward', method='POST',
+                        wait_url=f'{WEBHOOK_BASE_URL}/forward_wait', wait_url_method='POST')]
+    FORWARD_OUTCOMES.labels('callback').inc()
+    return callback_verbs()
+
+def dial_verb(number, tried=()):
+    """Dial one staff number; its action URL reports back to /forward"""
+    query = urlencode({'tried': ','.join((*tried, number))})
+    dial = Dial(action=f'{WEBHOOK_BASE_URL}/forward?{query}', method='POST', timeout=FORWARD_RING_SECONDS)
+    dial.number(number)
+    return dial
+
+def callback_verbs():
+    recording = {}
+    if recording_archive:
+        # Archive the message, and have Twilio transcribe it
+        status_url = f"{WEBHOOK_BASE_URL}/recording_status?{urlencode({'kind': 'voicemail'})}"
+        recording = {'recording_status_callback': status_url, 'recording_status_callback_event': 'completed absent'}
+        if RECORDING_TRANSCRIBE:
+            recording.update(transcribe=True, transcribe_callback=status_url)
+    return [
+        Say("Everyone on our team is busy right now. After the tone, please leave your name, number and "
+            "what you need, and we'll call you back.", voice='Polly.Joanna'),
+        Record(action=f'{WEBHOOK_BASE_URL}/callback_request', method='POST', max_length=120,
+               play_beep=True, finish_on_key='#', **recording),
+    ]
+
+def forward_response(name, call_sid, tried=()):
+    """Pre-rendered transfer prompt followed by the dispatch verbs for this call"""
+    return g.knowledge.twiml.response_followed_by(name, *forward_verbs(call_sid, tried))
+
+@app.route('/forward', methods=['POST'])
+def forward_call():
+    """Dispatch a call to staff: redirected here, or back from a Dial or Enqueue"""
+    call_sid = request.form.get('CallSid')
+    dispatcher = g.tenant.dispatcher
+    try:
+        dial_status = request.form.get('DialCallStatus')
+        if dial_status is not None:
+            # The staff leg ended: free the slot, and hunt on if nobody picked up
+            if dispatcher and call_sid:
+                dispatcher.release(call_sid)
+            if dial_status in ('completed', 'canceled'):
+                return g.knowledge.twiml.response('hangup')
+            FORWARD_OUTCOMES.labels('no_answer').inc()
+            tried = tuple(number for number in request.args.get('tried', '').split(',') if number)
+            return forward_response('dispatch', call_sid, tried)
+        
+        queue_result = request.form.get('QueueResult')
+        if queue_result is not None:
+            # Left the hold queue: forward_wait claimed a number, the wait ran out, or
+            # Twilio couldn't queue the call (queue-full, error, system-error)
+            if dispatcher and call_sid:
+                dispatcher.unhold(call_sid)
+            if queue_result == 'hangup':
+                return g.knowledge.twiml.response('hangup')
+            number = dispatcher.claimed(call_sid) if dispatcher and call_sid and queue_result == 'leave' else None
+            if number:
+                return g.knowledge.twiml.response_followed_by('dispatch', dial_verb(number))
+            if queue_result != 'leave':
+                logger.warning(f"Call {call_sid} could not be queued ({queue_result}); offering a callback")
+            return g.knowledge.twiml.response_followed_by('dispatch', *callback_verbs())
+        
+        record_forward(call_sid, request.args.get('reason', 'redirected'))
+        return forward_response('dispatch', call_sid)
+    
+    except Exception as e:
+        logger.error(f"Error in forward_call: {str(e)}")
+        ERRORS.labels('forward_call').inc()
+        return g.knowledge.twiml.response_followed_by('dispatch', *callback_verbs())
 
-def should_forward_to_owner(speech_text):
-    """Check if the speech contains keywords that should trigger forwarding"""
-    speech_lower = speech_text.lower()
-    return any(keyword in speech_lower for keyword in FORWARD_KEYWORDS)
+@app.route('/forward_wait', methods=['POST'])
+def forward_wait():
+    """Enqueue wait loop: leave the queue once a number frees up for the caller at the front"""
+    call_sid = request.form.get('CallSid')
+    dispatcher = g.tenant.dispatcher
+    if dispatcher and call_sid and request.form.get('QueuePosition') == '1' \
+            and dispatcher.claim(call_sid, queued=True):
+        return g.knowledge.twiml.response('queue_leave')
+    if int(request.form.get('QueueTime', 0)) >= FORWARD_QUEUE_MAX_WAIT:
+        return g.knowledge.twiml.response('queue_leave')
+    return g.knowledge.twiml.response('queue_wait')
+
+@app.route('/callback_request', methods=['POST'])
+def callback_request():
+    """Record action: the caller left a message asking to be called back"""
+    call_sid = request.form.get('CallSid')
+    caller_number = request.form.get('From', 'Unknown')
+    recording_url = request.form.get('RecordingUrl')
+    if recording_url and int(request.form.get('RecordingDuration', 0)) > 0:
+        record_forward(call_sid, 'callback_requested')
+        if callback_queue and caller_number.startswith('+'):
+            callback_queue.request(caller_number, g.tenant.tenant_id, call_sid, request.form.get('To'),
+                                   'voicemail', recording_url=recording_url)
+            CALLBACKS.labels('voicemail').inc()
+        else:
+            logger.info(f"Callback requested by {caller_number} on call {call_sid}: {recording_url}")
+    return g.knowledge.twiml.response('callback_recorded')
+
+@app.route('/recording_status', methods=['POST'])
+def recording_status():
+    """Recording and transcription callbacks: note them on the call record and archive finished audio"""
+    try:
+        call_sid = request.form.get('CallSid')
+        recording_sid = request.form.get('RecordingSid')
+        kind = request.args.get('kind', 'call')
+        if not recording_sid:
+            return Response('OK', mimetype='text/plain')
+        
+        transcription_status = request.form.get('TranscriptionStatus')
+        if transcription_status:
+            RECORDINGS.labels(kind, f'transcription_{transcription_status}').inc()
+            call_events.emit(call_events.RECORDING, call_sid=call_sid, recording_sid=recording_sid, kind=kind,
+                             transcription_status=transcription_status)
+            if call_records:
+                call_records.transcription(call_sid, recording_sid, transcription_status,
+                                           request.form.get('TranscriptionText'))
+            return Response('OK', mimetype='text/plain')
+        
+        status = request.form.get('RecordingStatus', 'completed')
+        recording_url = request.form.get('RecordingUrl')
+        duration = int(request.form.get('RecordingDuration') or 0)
+        channels = int(request.form.get('RecordingChannels') or 1)
+        RECORDINGS.labels(kind, status).inc()
+        call_events.emit(call_events.RECORDING, call_sid=call_sid, recording_sid=recording_sid, kind=kind,
+                         status=status, duration=duration)
+        if call_records:
+            call_records.recording(call_sid, recording_sid, kind, status, duration, channels, recording_url)
+        if status == 'completed' and recording_url and recording_archive:
+            if not recording_archive.download(recording_sid, call_sid, recording_url):
+                RECORDINGS.labels(kind, 'dropped').inc()
+        return Response('OK', mimetype='text/plain')
+        
+    except Exception as e:
+        logger.error(f"Error in recording_status: {str(e)}")
+        ERRORS.labels('recording_status').inc()
+        return Response('Error', mimetype='text/plain')
+
+def start_call_recording(call_sid):
+    """Have Twilio record the whole call, both sides (runs on a recording worker thread)"""
+    twilio_client.calls(call_sid).recordings.create(
+        recording_status_callback=f'{WEBHOOK_BASE_URL}/recording_status',
+        recording_status_callback_event=['completed', 'absent'],
+        recording_channels='dual')
+
+def recording_archived(recording_sid, call_sid, stored):
+    RECORDINGS.labels('archive', 'stored').inc()
+    logger.info(f"Recording {recording_sid} for call {call_sid} stored at {stored.location} ({stored.size} bytes)")
+    if call_records:
+        call_records.recording_stored(call_sid, recording_sid, stored.location, stored.size)
+
+def recording_archive_failed(recording_sid, call_sid, error):
+    RECORDINGS.labels('archive', 'download_failed').inc()
+    logger.error(f"Recording {recording_sid} for call {call_sid} could not be archived: {error}")
+    if call_records:
+        call_records.recording_failed(call_sid, recording_sid, error)
 
 @app.route('/call_status', methods=['POST'])
 def call_status():
@@ -288,16 +1169,27 @@ def call_status():
         to_number = request.form.get('To')
         duration = request.form.get('CallDuration', '0')
         
-        logger.info(f"Call {call_sid} status: {call_status}, Duration: {duration}s")
+        call_events.emit(call_events.STATUS_CHANGED, call_sid=call_sid, status=call_status, duration=duration)
+        
+        # Persist final states; Twilio only sends these once per call
+        if call_sid and call_status in ('completed', 'busy', 'no-answer', 'failed', 'canceled'):
+            if call_records:
+                call_records.call_ended(call_sid, call_status, duration, from_number, to_number)
+            if g.tenant.dispatcher:
+                g.tenant.dispatcher.end(call_sid)
         
         # Log call completion
         if call_status == 'completed':
-            logger.info(f"Call completed: {from_number} -> {to_number}, Duration: {duration}s")
+            call_events.emit(call_events.COMPLETED, call_sid=call_sid, caller=from_number,
+                             called=to_number, duration=duration)
+            if call_sid:
+                call_sessions.end(call_sid)
             
         return Response('OK', mimetype='text/plain')
         
     except Exception as e:
         logger.error(f"Error in call_status: {str(e)}")
+        ERRORS.labels('call_status').inc()
         return Response('Error', mimetype='text/plain')
 
 @app.route('/health', methods=['GET'])
@@ -306,19 +1198,50 @@ def health_check():
     return {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'chatbot_id': CHATBOT_ID,
-        'business': BUSINESS_NAME
+        'chatbot_id': g.tenant.chatbot_id,
+        'chatbot_backend': g.tenant.chatbot.stats() if g.tenant.chatbot else None,
+        'forwarding': g.tenant.dispatcher.stats() if g.tenant.dispatcher else None,
+        'callbacks': callback_queue.stats() if callback_queue else None,
+        'recordings': recording_archive.stats() if recording_archive else None,
+        'business': g.knowledge.knowledge_base.business_name,
+        'answer_cache': g.tenant.answer_cache.stats(),
+        'knowledge_base_version': g.knowledge.knowledge_base.version,
+        'faq_entries': len(g.knowledge.knowledge_base.faq),
+        'tenants': len(tenant_registry)
     }
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def require_admin():
+    """404 unless ADMIN_TOKEN is set and sent as a bearer token"""
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not ADMIN_TOKEN or not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        abort(404)
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    """Show profiler status; POST {"sample_rate": 0.05} to change it or {"dump": true} to write profiles"""
+    require_admin()
+    written = []
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if 'sample_rate' in body:
+            try:
+                profiler.sample_rate = min(max(float(body['sample_rate']), 0.0), 1.0)
+            except (TypeError, ValueError):
+                return {'error': 'sample_rate must be a number between 0 and 1'}, 400
+            logger.info(f"Profiling sample rate set to {profiler.sample_rate}")
+        if body.get('dump'):
+            written = profiler.dump()
+    return {**profiler.status(), 'written': written}
+
 @app.route('/test_tts', methods=['GET'])
 def test_tts():
     """Test endpoint for TTS"""
-    response = VoiceResponse()
-    response.say(
-        f"This is a test of the {BUSINESS_NAME} AI phone system. Text-to-speech is working correctly.",
-        voice='Polly.Joanna'
-    )
-    return Response(str(response), mimetype='text/xml')
+    return g.knowledge.twiml.response('test_tts')
 
 if __name__ == '__main__':
     # Validate required environment variables
@@ -333,10 +1256,10 @@ if __name__ == '__main__':
         print(f"Please set the following environment variables: {missing_vars}")
     else:
         if demo_mode:
-            logger.info(f"Starting AI Phone Integration in DEMO MODE for {BUSINESS_NAME}")
+            logger.info(f"Starting AI Phone Integration in DEMO MODE for {tenant_registry.default.knowledge_base.business_name}")
             print("🚀 Demo Mode: AI Phone Integration is running!")
             print("📞 This is a demonstration version - replace demo credentials with real Twilio credentials for production use")
         else:
-            logger.info(f"Starting AI Phone Integration for {BUSINESS_NAME}")
+            logger.info(f"Starting AI Phone Integration for {tenant_registry.default.knowledge_base.business_name}")
         
         app.run(host='0.0.0.0', port=8080, debug=False)
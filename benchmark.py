@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Webhook benchmark for the AI phone app
+Simulates complete Twilio calls (greeting -> speech -> follow-ups -> status
+callback) at a configurable concurrency against a local app instance with
+the chatbot backend stubbed, then reports per-route latency histograms and
+requests per second. Results can be saved as a baseline and later runs
+compared against it to catch regressions before deploying.
+
+Usage:
+  python benchmark.py [--calls 200] [--concurrency 16] [--chatbot-delay 0.05]
+                      [--url http://127.0.0.1:8080] [--save-baseline] [--compare]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import chatbot_stub
+
+ROUTES = ('/voice', '/process_speech', '/process_followup', '/call_status')
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 15000)
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+QUESTIONS = [
+    "How much does lawn mowing cost?",
+    "Are you open on Saturday?",
+    "Do you do window washing for businesses?",
+    "I'd like to schedule an appointment for next week",
+    "What services do you offer?",
+    "Can I get a quote for my backyard?",
+    "Do you trim hedges?",
+    "How do I reach you after hours?",
+]
+FOLLOWUPS = [
+    "What about window cleaning?",
+    "When are you available?",
+    "Do you do commercial properties?",
+    "How long does a visit take?",
+]
+ENDINGS = ["No, that's all, thanks", "Goodbye", "Can you transfer me to a person?"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(delay=0.0):
+    """Run the chatbot stub on a free port; returns (server, url)"""
+    port = free_port()
+    server = chatbot_stub.serve(port, delay=delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{port}/'
+
+
+def start_app(port, chatbot_url, mode='gthread', extra_env=None):
+    """Launch gunicorn with gunicorn.conf.py and wait for /health"""
+    env = dict(os.environ,
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS=mode,
+               WEB_CONCURRENCY='1',
+               CHATBOT_API_URL=chatbot_url,
+               WEBHOOK_BASE_URL=f'http://127.0.0.1:{port}',
+               VALIDATE_TWILIO_SIGNATURES='false',  # the simulated calls aren't signed
+               RATE_LIMIT_ENABLED='false',  # every simulated caller shares 127.0.0.1
+               ENABLE_CALL_RECORDING='false',  # the simulated CallSids don't exist at Twilio
+               CALLBACKS_DB='',  # simulated callers must never page staff
+               CALL_RECORDS_DB='',  # keep benchmark calls out of the call history
+               CALL_EVENT_LEVEL='WARNING',  # no call events (CALL_EVENT_LOG='' would mean stdout)
+               **(extra_env or {}))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"gunicorn ({mode}) did not come up")
+
+
+def simulate_call(base_url, call_number, rng, timings, max_followups=2, timeout=15):
+    """Post one full call flow, appending (route, seconds, ok) to timings"""
+    call_sid = f'CA{call_number:032d}'
+    form = {
+        'CallSid': call_sid,
+        'AccountSid': 'AC' + '0' * 32,
+        'From': f'+1555{call_number % 10_000_000:07d}',
+        'To': '+15550000000',
+        'Direction': 'inbound',
+    }
+
+    def post(route, extra=None):
+        start = time.perf_counter()
+        try:
+            reply = session.post(base_url + route, data=dict(form, **(extra or {})), timeout=timeout)
+            ok = reply.status_code == 200
+            body = reply.content
+        except requests.RequestException:
+            ok, body = False, b''
+        timings.append((route, time.perf_counter() - start, ok))
+        return body
+
+    with requests.Session() as session:
+        post('/voice', {'CallStatus': 'ringing'})
+        body = post('/process_speech', {
+            'SpeechResult': rng.choice(QUESTIONS),
+            'Confidence': f'{rng.uniform(0.6, 0.98):.2f}',
+        })
+        for _ in range(rng.randint(0, max_followups)):
+            if b'process_followup' not in body:
+                break
+            body = post('/process_followup', {'SpeechResult': rng.choice(FOLLOWUPS)})
+        if b'process_followup' in body:
+            post('/process_followup', {'SpeechResult': rng.choice(ENDINGS)})
+        post('/call_status', {'CallStatus': 'completed', 'CallDuration': str(rng.randint(20, 240))})
+
+
+def run(base_url, calls, concurrency, seed=1):
+    """Run the benchmark; returns (timings, elapsed seconds)"""
+    timings = []
+    rngs = [random.Random(seed + n) for n in range(calls)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda n: simulate_call(base_url, n, rngs[n], timings), range(calls)))
+    return timings, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def summarize(timings, elapsed):
+    """Per-route latency stats and histogram, plus totals"""
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for route, seconds, ok in timings:
+        by_route[route].append(seconds * 1000)
+        if not ok:
+            errors[route] += 1
+
+    routes = {}
+    for route in ROUTES:
+        values = sorted(by_route.get(route, []))
+        histogram = [0] * (len(BUCKETS_MS) + 1)
+        for value in values:
+            index = next((i for i, bound in enumerate(BUCKETS_MS) if value <= bound), len(BUCKETS_MS))
+            histogram[index] += 1
+        routes[route] = {
+            'count': len(values),
+            'errors': errors[route],
+            'p50_ms': percentile(values, 0.50),
+            'p90_ms': percentile(values, 0.90),
+            'p99_ms': percentile(values, 0.99),
+            'mean_ms': statistics.fmean(values) if values else float('nan'),
+            'histogram': histogram,
+        }
+    return {
+        'requests': len(timings),
+        'errors': sum(errors.values()),
+        'elapsed_s': elapsed,
+        'requests_per_sec': len(timings) / elapsed if elapsed else 0.0,
+        'routes': routes,
+    }
+
+
+def print_report(summary):
+    print(f"\n📊 {summary['requests']} requests in {summary['elapsed_s']:.2f}s "
+          f"→ {summary['requests_per_sec']:.1f} req/s, {summary['errors']} errors")
+    print(f"\n{'route':<18} {'count':>6} {'err':>4} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for route, stats in summary['routes'].items():
+        print(f"{route:<18} {stats['count']:>6} {stats['errors']:>4} "
+              f"{stats['p50_ms']:>8.1f} {stats['p90_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+
+    for route, stats in summary['routes'].items():
+        if not stats['count']:
+            continue
+        print(f"\n{route} latency histogram")
+        peak = max(stats['histogram'])
+        labels = [f'<= {bound} ms' for bound in BUCKETS_MS] + [f'> {BUCKETS_MS[-1]} ms']
+        for label, count in zip(labels, stats['histogram']):
+            if count:
+                print(f"   {label:>12} {count:>6} {'#' * max(1, round(40 * count / peak))}")
+
+
+def compare(summary, baseline, tolerance):
+    """Return a list of regressions versus the baseline"""
+    regressions = []
+    if summary['requests_per_sec'] < baseline['requests_per_sec'] * (1 - tolerance):
+        regressions.append(f"throughput {summary['requests_per_sec']:.1f} req/s "
+                           f"vs baseline {baseline['requests_per_sec']:.1f}")
+    for route, stats in summary['routes'].items():
+        base = baseline['routes'].get(route)
+        if not base or not stats['count']:
+            continue
+        for key in ('p50_ms', 'p99_ms'):
+            if stats[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{route} {key} {stats[key]:.1f} vs baseline {base[key]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Twilio webhook call flows')
+    parser.add_argument('--url', help='benchmark a running app instead of starting one')
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--chatbot-delay', type=float, default=0.05, help='stubbed LLM latency (s)')
+    parser.add_argument('--mode', default='gthread', help='gunicorn worker class for the local app')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true', help='fail if slower than the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    stub = process = None
+    base_url = args.url
+    if not base_url:
+        stub, chatbot_url = start_stub(args.chatbot_delay)
+        port = free_port()
+        process = start_app(port, chatbot_url, args.mode)
+        base_url = f'http://127.0.0.1:{port}'
+
+    print(f"🏁 Benchmarking {base_url}: {args.calls} calls, concurrency {args.concurrency}")
+    try:
+        timings, elapsed = run(base_url, args.calls, args.concurrency)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        if stub:
+            stub.shutdown()
+
+    summary = summarize(timings, elapsed)
+    summary['config'] = {'calls': args.calls, 'concurrency': args.concurrency,
+                         'chatbot_delay': args.chatbot_delay, 'mode': args.mode}
+    print_report(summary)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\n❌ No baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"   • {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Structured call-event logging
+Routes emit typed events; a QueueHandler hands the raw record to a background
+writer that serializes batches as JSON lines, so the webhook path only pays
+for a queue put (and nothing at all when the event logger is disabled)
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+
+# Event types
+CALL_STARTED = 'call_started'
+SPEECH_RECEIVED = 'speech_received'
+INTENT_MATCHED = 'intent_matched'
+FORWARDED = 'forwarded'
+STATUS_CHANGED = 'status_changed'
+COMPLETED = 'completed'
+RECORDING = 'recording'
+
+EVENT_TYPES = (CALL_STARTED, SPEECH_RECEIVED, INTENT_MATCHED, FORWARDED, STATUS_CHANGED, COMPLETED, RECORDING)
+
+event_logger = logging.getLogger('call_events')
+event_logger.propagate = False
+
+
+def emit(event, **fields):
+    """Queue a call event; fields must be JSON-serializable"""
+    if not event_logger.isEnabledFor(logging.INFO):
+        return
+    event_logger.info({'event': event, **fields})
+
+
+class _RawQueueHandler(QueueHandler):
+    """Enqueue the record untouched; the writer thread does all formatting"""
+
+    def prepare(self, record):
+        return record
+
+
+class CallEventWriter:
+    """Background thread writing queued events as batched JSON lines"""
+
+    def __init__(self, stream, batch_size=100, flush_interval=1.0):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='call-events', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._write(self._drain())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write([first] + self._drain(self.batch_size - 1))
+
+    def _drain(self, limit=None):
+        records = []
+        while limit is None or len(records) < limit:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _write(self, records):
+        if not records:
+            return
+        lines = []
+        for record in records:
+            payload = {'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat()}
+            payload.update(record.msg)
+            lines.append(json.dumps(payload, default=str))
+        try:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+        except Exception as e:
+            sys.stderr.write(f"call_events: failed to write {len(lines)} events: {e}\n")
+
+
+def configure(path=None, level=logging.INFO, batch_size=100, flush_interval=1.0):
+    """Attach the queue handler and start the writer
+
+    path '-' or None writes to stdout; level above INFO disables events.
+    """
+    stream = sys.stdout if path in (None, '', '-') else open(path, 'a', buffering=1)
+    writer = CallEventWriter(stream, batch_size, flush_interval)
+    for handler in list(event_logger.handlers):
+        event_logger.removeHandler(handler)
+    event_logger.addHandler(_RawQueueHandler(writer.queue))
+    event_logger.setLevel(level)
+    writer.start()
+    return writer
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Persistent call records
+Webhooks queue lifecycle updates in O(1); a background thread writes them to
+SQLite (WAL mode) in batched transactions. Indexed queries answer questions
+like "how many calls were forwarded yesterday" without a full scan.
+
+CLI:
+  python call_records.py summary [--since 2026-10-17] [--until 2026-10-18]
+  python call_records.py by-hour [--since ...] [--until ...]
+  python call_records.py caller +15551234567
+  python call_records.py transcript CA0123...
+"""
+import argparse
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_sid TEXT PRIMARY KEY,
+    caller TEXT,
+    called TEXT,
+    started_at REAL,
+    ended_at REAL,
+    status TEXT,
+    duration INTEGER,
+    outcome TEXT,
+    forwarded INTEGER NOT NULL DEFAULT 0,
+    forward_reason TEXT,
+    turns INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_calls_caller ON calls (caller, started_at);
+CREATE INDEX IF NOT EXISTS idx_calls_started_at ON calls (started_at);
+CREATE INDEX IF NOT EXISTS idx_calls_outcome ON calls (outcome, started_at);
+
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    call_sid TEXT NOT NULL,
+    at REAL NOT NULL,
+    stage TEXT,
+    transcript TEXT,
+    intents TEXT,
+    answer TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_turns_call_sid ON turns (call_sid);
+
+CREATE TABLE IF NOT EXISTS recordings (
+    recording_sid TEXT PRIMARY KEY,
+    call_sid TEXT NOT NULL,
+    kind TEXT,
+    status TEXT,
+    duration INTEGER,
+    channels INTEGER,
+    source_url TEXT,
+    location TEXT,
+    size INTEGER,
+    transcript TEXT,
+    transcription_status TEXT,
+    created_at REAL,
+    stored_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_call_sid ON recordings (call_sid);
+"""
+
+# Outcomes stored on completion
+OUTCOME_FORWARDED = 'forwarded'
+OUTCOME_HANDLED = 'handled'
+
+# Recording states after Twilio's own (in-progress, completed, absent, failed)
+RECORDING_STORED = 'stored'
+RECORDING_DOWNLOAD_FAILED = 'download_failed'
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class CallRecordStore:
+    """Queue-fed SQLite writer plus read-side queries"""
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._write_conn = connect(path)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='call-records', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._flush(self._drain())
+
+    # Write side: every method is a single queue put
+
+    def call_started(self, call_sid, caller, called):
+        self.queue.put(('started', call_sid, caller, called, time.time()))
+
+    def turn(self, call_sid, stage, transcript, intents=(), answer=None):
+        self.queue.put(('turn', call_sid, time.time(), stage, transcript,
+                        json.dumps(sorted(intents)), answer))
+
+    def forwarded(self, call_sid, reason):
+        self.queue.put(('forwarded', call_sid, reason))
+
+    def call_ended(self, call_sid, status, duration, caller=None, called=None):
+        self.queue.put(('ended', call_sid, status, int(duration or 0), caller, called, time.time()))
+
+    def recording(self, call_sid, recording_sid, kind, status, duration=None, channels=None, url=None):
+        self.queue.put(('recording', call_sid, recording_sid, kind, status, int(duration or 0),
+                        int(channels or 1), url, time.time()))
+
+    def recording_stored(self, call_sid, recording_sid, location, size):
+        self.queue.put(('recording_stored', call_sid, recording_sid, location, size, time.time()))
+
+    def recording_failed(self, call_sid, recording_sid, error):
+        self.queue.put(('recording_failed', call_sid, recording_sid, error))
+
+    def transcription(self, call_sid, recording_sid, status, text=None):
+        self.queue.put(('transcription', call_sid, recording_sid, status, text, time.time()))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._flush([first] + self._drain(self.batch_size - 1))
+
+    def _drain(self, limit=None):
+        items = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _flush(self, items):
+        if not items:
+            return
+        try:
+            with self._write_conn:
+                for kind, call_sid, *values in items:
+                    getattr(self, f'_write_{kind}')(call_sid, *values)
+        except sqlite3.Error as e:
+            logger.error("Failed to write %d call record updates: %s", len(items), e)
+
+    def _write_started(self, call_sid, caller, called, at):
+        self._write_conn.execute(
+            "INSERT INTO calls (call_sid, caller, called, started_at, status) VALUES (?, ?, ?, ?, 'in-progress') "
+            "ON CONFLICT (call_sid) DO UPDATE SET caller = excluded.caller, called = excluded.called, "
+            "started_at = COALESCE(calls.started_at, excluded.started_at)",
+            (call_sid, caller, called, at))
+
+    def _write_turn(self, call_sid, at, stage, transcript, intents, answer):
+        self._write_conn.execute(
+            "INSERT INTO turns (call_sid, at, stage, transcript, intents, answer) VALUES (?, ?, ?, ?, ?, ?)",
+            (call_sid, at, stage, transcript, intents, answer))
+        self._write_conn.execute("UPDATE calls SET turns = turns + 1 WHERE call_sid = ?", (call_sid,))
+
+    def _write_forwarded(self, call_sid, reason):
+        self._write_conn.execute(
+            "INSERT INTO calls (call_sid, forwarded, forward_reason) VALUES (?, 1, ?) "
+            "ON CONFLICT (call_sid) DO UPDATE SET forwarded = 1, forward_reason = excluded.forward_reason",
+            (call_sid, reason))
+
+    def _write_ended(self, call_sid, status, duration, caller, called, at):
+        self._write_conn.execute(
+            "INSERT INTO calls (call_sid, caller, called, started_at, ended_at, status, duration, outcome) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (call_sid) DO UPDATE SET ended_at = excluded.ended_at, status = excluded.status, "
+            "duration = excluded.duration, caller = COALESCE(calls.caller, excluded.caller), "
+            "called = COALESCE(calls.called, excluded.called), "
+            "started_at = COALESCE(calls.started_at, excluded.started_at), "
+            "outcome = CASE WHEN calls.forwarded THEN ? ELSE excluded.outcome END",
+            (call_sid, caller, called, at - duration, at, status, duration,
+             OUTCOME_HANDLED if status == 'completed' else status, OUTCOME_FORWARDED))
+
+    def _write_recording(self, call_sid, recording_sid, kind, status, duration, channels, url, at):
+        # A stored download outranks the status callback that triggered it
+        self._write_conn.execute(
+            "INSERT INTO recordings (recording_sid, call_sid, kind, status, duration, channels, source_url, "
+            "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (recording_sid) DO UPDATE SET kind = excluded.kind, duration = excluded.duration, "
+            "channels = excluded.channels, source_url = excluded.source_url, "
+            "status = CASE WHEN recordings.status IN (?, ?) THEN recordings.status ELSE excluded.status END",
+            (recording_sid, call_sid, kind, status, duration, channels, url, at,
+             RECORDING_STORED, RECORDING_DOWNLOAD_FAILED))
+
+    def _write_recording_stored(self, call_sid, recording_sid, location, size, at):
+        self._write_conn.execute(
+            "INSERT INTO recordings (recording_sid, call_sid, status, location, size, created_at, stored_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (recording_sid) DO UPDATE SET status = excluded.status, location = excluded.location, "
+            "size = excluded.size, stored_at = excluded.stored_at, error = NULL",
+            (recording_sid, call_sid, RECORDING_STORED, location, size, at, at))
+
+    def _write_recording_failed(self, call_sid, recording_sid, error):
+        self._write_conn.execute(
+            "INSERT INTO recordings (recording_sid, call_sid, status, error) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (recording_sid) DO UPDATE SET status = excluded.status, error = excluded.error",
+            (recording_sid, call_sid, RECORDING_DOWNLOAD_FAILED, error))
+
+    def _write_transcription(self, call_sid, recording_sid, status, text, at):
+        self._write_conn.execute(
+            "INSERT INTO recordings (recording_sid, call_sid, transcription_status, transcript, created_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (recording_sid) DO UPDATE SET transcription_status = excluded.transcription_status, "
+            "transcript = COALESCE(excluded.transcript, recordings.transcript)",
+            (recording_sid, call_sid, status, text, at))
+
+    # Read side: each query opens its own connection so it never contends
+    # with the writer's transaction
+
+    def _query(self, sql, params=()):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def summary(self, since, until):
+        """Call counts, forward rate and average duration in [since, until)"""
+        rows = self._query(
+            "SELECT COUNT(*) AS calls, SUM(forwarded) AS forwarded, AVG(duration) AS avg_duration, "
+            "SUM(turns) AS turns FROM calls WHERE started_at >= ? AND started_at < ?",
+            (since, until))
+        return rows[0]
+
+    def outcome_counts(self, since, until):
+        return {row['outcome']: row['calls'] for row in self._query(
+            "SELECT outcome, COUNT(*) AS calls FROM calls WHERE started_at >= ? AND started_at < ? "
+            "GROUP BY outcome", (since, until))}
+
+    def forwarded_count(self, since, until):
+        return self._query(
+            "SELECT COUNT(*) AS calls FROM calls WHERE outcome = ? AND started_at >= ? AND started_at < ?",
+            (OUTCOME_FORWARDED, since, until))[0]['calls']
+
+    def average_duration_by_hour(self, since, until):
+        """[{hour, calls, avg_duration}] by local hour of day"""
+        return self._query(
+            "SELECT CAST(strftime('%H', started_at, 'unixepoch', 'localtime') AS INTEGER) AS hour, "
+            "COUNT(*) AS calls, AVG(duration) AS avg_duration FROM calls "
+            "WHERE started_at >= ? AND started_at < ? AND duration IS NOT NULL GROUP BY hour ORDER BY hour",
+            (since, until))
+
+    def calls_for_caller(self, caller, limit=50):
+        return self._query(
+            "SELECT * FROM calls WHERE caller = ? ORDER BY started_at DESC LIMIT ?", (caller, limit))
+
+    def turns_for_call(self, call_sid):
+        return self._query("SELECT * FROM turns WHERE call_sid = ? ORDER BY at", (call_sid,))
+
+    def call(self, call_sid):
+        rows = self._query("SELECT * FROM calls WHERE call_sid = ?", (call_sid,))
+        return rows[0] if rows else None
+
+    def recordings_for_call(self, call_sid):
+        return self._query("SELECT * FROM recordings WHERE call_sid = ? ORDER BY created_at", (call_sid,))
+
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query stored call records')
+    parser.add_argument('--db', default='call_records.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('summary', 'by-hour'):
+        command = sub.add_parser(name)
+        command.add_argument('--since', help='ISO date/time (default: 24 hours ago)')
+        command.add_argument('--until', help='ISO date/time (default: now)')
+    caller = sub.add_parser('caller')
+    caller.add_argument('number')
+    transcript = sub.add_parser('transcript')
+    transcript.add_argument('call_sid')
+    args = parser.parse_args()
+
+    store = CallRecordStore(args.db)
+    if args.command == 'caller':
+        for row in store.calls_for_caller(args.number):
+            print(json.dumps(row))
+        return
+    if args.command == 'transcript':
+        print(json.dumps(store.call(args.call_sid)))
+        for turn in store.turns_for_call(args.call_sid):
+            print(f"[{turn['stage']}] caller: {turn['transcript']}")
+            if turn['answer']:
+                print(f"[{turn['stage']}] assistant: {turn['answer']}")
+        for recording in store.recordings_for_call(args.call_sid):
+            print(json.dumps(recording))
+        return
+
+    now = time.time()
+    since = _parse_day(args.since, now - 86400)
+    until = _parse_day(args.until, now)
+    if args.command == 'summary':
+        print(json.dumps({**store.summary(since, until), 'outcomes': store.outcome_counts(since, until)}, indent=2))
+    else:
+        print(f"{'hour':>4} {'calls':>6} {'avg s':>7}")
+        for row in store.average_duration_by_hour(since, until):
+            print(f"{row['hour']:>4} {row['calls']:>6} {row['avg_duration']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
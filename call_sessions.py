@@ -0,0 +1,187 @@
+"""
+Per-call conversation sessions keyed by Twilio CallSid
+Keeps the last few turns of each call so the chatbot gets context, with
+bounded memory: a ring buffer per call, a cap on live calls and idle expiry
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class Turn:
+    """One utterance in a call"""
+    __slots__ = ('role', 'text', 'at')
+
+    def __init__(self, role, text, at=None):
+        self.role = role
+        self.text = text
+        self.at = at if at is not None else time.time()
+
+    def to_dict(self):
+        return {'role': self.role, 'text': self.text, 'at': self.at}
+
+
+class CallSession:
+    """Conversation state for one call"""
+    __slots__ = ('call_sid', 'caller', 'started_at', 'last_seen', 'turn_count', 'caller_turns', 'turns')
+
+    def __init__(self, call_sid, caller=None, max_turns=10, started_at=None):
+        now = time.time()
+        self.call_sid = call_sid
+        self.caller = caller
+        self.started_at = started_at if started_at is not None else now
+        self.last_seen = now
+        self.turn_count = 0
+        self.caller_turns = 0
+        self.turns = deque(maxlen=max_turns)
+
+    def add_turn(self, role, text):
+        self.turns.append(Turn(role, text))
+        self.turn_count += 1
+        if role == 'caller':
+            self.caller_turns += 1
+        self.last_seen = time.time()
+
+    def history(self):
+        """Return the buffered turns as plain dicts for the chatbot backend"""
+        return [{'role': turn.role, 'text': turn.text} for turn in self.turns]
+
+    def to_json(self):
+        return json.dumps({
+            'call_sid': self.call_sid,
+            'caller': self.caller,
+            'started_at': self.started_at,
+            'last_seen': self.last_seen,
+            'turn_count': self.turn_count,
+            'caller_turns': self.caller_turns,
+            'max_turns': self.turns.maxlen,
+            'turns': [turn.to_dict() for turn in self.turns],
+        })
+
+    @classmethod
+    def from_json(cls, raw):
+        data = json.loads(raw)
+        session = cls(data['call_sid'], data['caller'], data['max_turns'], data['started_at'])
+        session.last_seen = data['last_seen']
+        session.turn_count = data['turn_count']
+        session.caller_turns = data.get('caller_turns', 0)
+        session.turns.extend(Turn(t['role'], t['text'], t['at']) for t in data['turns'])
+        return session
+
+
+class InMemorySessionBackend:
+    """Process-local backend for a single worker
+
+    Sessions are kept in last-used order; idle ones are swept on write and
+    the oldest are evicted once max_sessions is reached.
+    """
+
+    def __init__(self, max_sessions=1000, idle_ttl=900):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, call_sid):
+        with self._lock:
+            session = self._sessions.get(call_sid)
+            if session is None:
+                return None
+            if time.time() - session.last_seen > self.idle_ttl:
+                del self._sessions[call_sid]
+                return None
+            self._sessions.move_to_end(call_sid)
+            return session
+
+    def save(self, session):
+        with self._lock:
+            self._sessions[session.call_sid] = session
+            self._sessions.move_to_end(session.call_sid)
+            self._sweep()
+
+    def delete(self, call_sid):
+        with self._lock:
+            self._sessions.pop(call_sid, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _sweep(self):
+        cutoff = time.time() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and oldest.last_seen >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+class RedisSessionBackend:
+    """Shared backend for several gunicorn workers
+
+    Works with any client exposing get/setex/delete (redis-py, fakeredis,
+    or a compatible local server); Redis handles idle expiry via TTL.
+    """
+
+    def __init__(self, client, idle_ttl=900, prefix='call_session:'):
+        self.client = client
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+
+    def load(self, call_sid):
+        raw = self.client.get(self.prefix + call_sid)
+        return CallSession.from_json(raw) if raw else None
+
+    def save(self, session):
+        self.client.setex(self.prefix + session.call_sid, int(self.idle_ttl), session.to_json())
+
+    def delete(self, call_sid):
+        self.client.delete(self.prefix + call_sid)
+
+
+class SessionStore:
+    """Front end used by the routes"""
+
+    def __init__(self, backend, max_turns=10):
+        self.backend = backend
+        self.max_turns = max_turns
+
+    def get_or_create(self, call_sid, caller=None):
+        session = self.backend.load(call_sid)
+        if session is None:
+            session = CallSession(call_sid, caller, self.max_turns)
+            self.backend.save(session)
+        return session
+
+    def record_turn(self, call_sid, role, text, caller=None):
+        """Append a turn and return the updated session"""
+        session = self.get_or_create(call_sid, caller)
+        session.add_turn(role, text)
+        self.backend.save(session)
+        return session
+
+    def get(self, call_sid):
+        return self.backend.load(call_sid)
+
+    def history(self, call_sid):
+        session = self.backend.load(call_sid)
+        return session.history() if session else []
+
+    def end(self, call_sid):
+        self.backend.delete(call_sid)
+
+
+def make_session_store(redis_url=None, max_turns=10, max_sessions=1000, idle_ttl=900):
+    """Build a SessionStore, using Redis when a URL is given"""
+    if redis_url:
+        try:
+            import redis
+        except ImportError:
+            logger.error("SESSION_REDIS_URL is set but the redis package is not installed; "
+                         "falling back to in-process sessions")
+        else:
+            return SessionStore(RedisSessionBackend(redis.Redis.from_url(redis_url), idle_ttl), max_turns)
+    return SessionStore(InMemorySessionBackend(max_sessions, idle_ttl), max_turns)
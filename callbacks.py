@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Durable callback requests
+Webhooks record a promised callback with a single queue put; a background
+thread persists requests to SQLite and hands due ones to a bounded worker
+pool that notifies staff (through Twilio). Failed notifications are retried
+with exponential backoff, and sends are throttled to stay inside Twilio's
+API rate limits. A caller has at most one open request per business, so
+asking twice doesn't page the team twice.
+
+Requests are claimed inside a BEGIN IMMEDIATE transaction, so several
+gunicorn workers can share one database; a claim that isn't settled within
+claim_timeout (the worker died) becomes due again.
+
+CLI:
+  python callbacks.py list [--status pending]
+  python callbacks.py retry 42
+"""
+import argparse
+import json
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS callbacks (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    tenant_id TEXT,
+    call_sid TEXT,
+    caller TEXT NOT NULL,
+    called TEXT,
+    intent TEXT,
+    transcript TEXT,
+    recording_url TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    completed_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_callbacks_due ON callbacks (status, next_attempt_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_callbacks_open ON callbacks (tenant_id, caller)
+    WHERE status IN ('pending', 'sending');
+"""
+
+# Request states
+PENDING = 'pending'
+SENDING = 'sending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class CallbackRejected(Exception):
+    """Raised by a notifier when retrying can't help (e.g. an invalid number)"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class CallbackQueue:
+    """Queue-fed SQLite store of callback requests plus the workers that send them
+
+    notify(request) receives the stored row as a dict and raises on failure
+    (CallbackRejected for failures not worth retrying).
+    """
+
+    def __init__(self, path, notify=None, workers=4, max_attempts=5, retry_delay=30.0,
+                 rate_per_minute=60, poll_interval=1.0, claim_timeout=300.0):
+        self.path = path
+        self.notify = notify
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.queue = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        self._throttle = RateLimiter(rate_per_minute, burst=max(workers, 1))
+        self._in_flight = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._conn = connect(path)
+
+    def start(self):
+        if self.notify is not None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='callback')
+        self._thread = threading.Thread(target=self._run, name='callbacks', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        self._settle()
+        self._store(self._drain(self.queue))
+
+    # Write side: a single queue put
+
+    def request(self, caller, tenant_id=None, call_sid=None, called=None, intent=None, transcript=None,
+                recording_url=None):
+        self.queue.put((time.time(), tenant_id, call_sid, caller, called, intent, transcript, recording_url))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._store(self._drain(self.queue))
+                self._settle()
+                if self._executor is not None:
+                    self._dispatch()
+            except sqlite3.Error as e:
+                logger.error(f"Callback queue database error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    @staticmethod
+    def _drain(source):
+        items = []
+        while True:
+            try:
+                items.append(source.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _store(self, requests):
+        if not requests:
+            return
+        with self._conn:
+            for created_at, tenant_id, call_sid, caller, called, intent, transcript, recording_url in requests:
+                # An open request for this caller absorbs the new one, keeping anything it adds
+                self._conn.execute(
+                    "INSERT INTO callbacks (created_at, tenant_id, call_sid, caller, called, intent, transcript, "
+                    "recording_url, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (tenant_id, caller) WHERE status IN ('pending', 'sending') DO UPDATE SET "
+                    "intent = COALESCE(callbacks.intent, excluded.intent), "
+                    "transcript = COALESCE(callbacks.transcript, excluded.transcript), "
+                    "recording_url = COALESCE(excluded.recording_url, callbacks.recording_url)",
+                    (created_at, tenant_id, call_sid, caller, called, intent, transcript, recording_url,
+                     created_at))
+
+    def _dispatch(self):
+        """Claim due requests for free workers, as fast as the throttle allows"""
+        free = self.workers - self._in_flight
+        if free <= 0:
+            return
+        now = time.time()
+        with self._conn:
+            # Select and mark in one write transaction, so no other worker claims the same rows
+            # (UPDATE ... RETURNING would need SQLite 3.35)
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = [dict(row) for row in self._conn.execute(
+                "SELECT * FROM callbacks WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND claimed_at < ?) ORDER BY next_attempt_at LIMIT ?",
+                (now, now - self.claim_timeout, free))]
+            self._conn.executemany("UPDATE callbacks SET status = 'sending', claimed_at = ? WHERE id = ?",
+                                   [(now, row['id']) for row in rows])
+        for row in rows:
+            row.update(status=SENDING, claimed_at=now)
+            if not self._throttle.allow('twilio'):
+                # Over the API budget: hand the rest back untouched
+                self._results.put((row['id'], None, None))
+                continue
+            self._in_flight += 1
+            self._executor.submit(self._send, row)
+
+    def _send(self, request):
+        try:
+            self.notify(request)
+            self._results.put((request['id'], True, None))
+        except CallbackRejected as e:
+            logger.error(f"Callback {request['id']} for {request['caller']} rejected: {e}")
+            self._results.put((request['id'], False, f'rejected: {e}'))
+        except Exception as e:
+            logger.warning(f"Callback {request['id']} for {request['caller']} failed: {e}")
+            self._results.put((request['id'], False, str(e)))
+
+    def _settle(self):
+        """Record worker results: done, retry later with backoff, or give up"""
+        results = self._drain(self._results)
+        if not results:
+            return
+        now = time.time()
+        with self._conn:
+            for callback_id, succeeded, error in results:
+                if succeeded is None:
+                    self._conn.execute("UPDATE callbacks SET status = 'pending', claimed_at = NULL WHERE id = ?",
+                                       (callback_id,))
+                    continue
+                self._in_flight -= 1
+                if succeeded:
+                    self._conn.execute("UPDATE callbacks SET status = 'done', attempts = attempts + 1, "
+                                       "completed_at = ?, last_error = NULL WHERE id = ?", (now, callback_id))
+                    continue
+                attempts = self._conn.execute("SELECT attempts FROM callbacks WHERE id = ?",
+                                              (callback_id,)).fetchone()[0] + 1
+                give_up = attempts >= self.max_attempts or error.startswith('rejected:')
+                delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                self._conn.execute(
+                    "UPDATE callbacks SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL, "
+                    "last_error = ? WHERE id = ?",
+                    (FAILED if give_up else PENDING, attempts, now + delay, error, callback_id))
+
+    # Read side
+
+    def _query(self, sql, params=()):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def stats(self):
+        counts = {row['status']: row['requests'] for row in self._query(
+            "SELECT status, COUNT(*) AS requests FROM callbacks GROUP BY status")}
+        return {'by_status': counts, 'in_flight': self._in_flight}
+
+    def list(self, status=None, limit=100):
+        if status:
+            return self._query("SELECT * FROM callbacks WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                               (status, limit))
+        return self._query("SELECT * FROM callbacks ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def retry(self, callback_id):
+        """Make a failed request due again; True if there was one"""
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE callbacks SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                "WHERE id = ? AND status = 'failed'", (time.time(), callback_id)).rowcount > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect stored callback requests')
+    parser.add_argument('--db', default='callbacks.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    listing = sub.add_parser('list')
+    listing.add_argument('--status', choices=(PENDING, SENDING, DONE, FAILED))
+    retry = sub.add_parser('retry')
+    retry.add_argument('id', type=int)
+    args = parser.parse_args()
+
+    callbacks = CallbackQueue(args.db)
+    if args.command == 'list':
+        for row in callbacks.list(args.status):
+            print(json.dumps(row))
+    elif not callbacks.retry(args.id):
+        print(f"No failed callback request {args.id}")
+
+
+if __name__ == '__main__':
+    main()
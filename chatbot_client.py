@@ -0,0 +1,149 @@
+"""
+HTTP client for the Abacus.ai ChatLLM backend
+Keeps a pooled keep-alive session, enforces a per-call deadline that fits in
+Twilio's 15 second webhook budget and streams the reply sentence by sentence
+"""
+import json
+import logging
+import re
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class ChatbotTimeout(Exception):
+    """Raised when the backend doesn't answer inside the call deadline"""
+
+
+class ChatbotReply(str):
+    """Reply text; truncated is True when the deadline cut the reply short"""
+    truncated = False
+
+
+class ChatbotClient:
+    """Pooled, deadline-bound client for a streaming chat endpoint
+
+    The endpoint receives a JSON POST and may answer with a JSON body
+    ({"response": "..."}), a server-sent event stream ("data: <token>"
+    lines) or plain chunked text.
+    """
+
+    def __init__(self, api_url, chatbot_id=None, api_key=None, connect_timeout=2.0,
+                 deadline=8.0, pool_size=10):
+        self.api_url = api_url
+        self.chatbot_id = chatbot_id
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'text/event-stream, application/json, text/plain'
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+    def stream_sentences(self, message, caller_number=None, history=None, deadline=None):
+        """Yield complete sentences as soon as the backend has produced them
+
+        Raises ChatbotTimeout if the deadline passes before the stream ends;
+        sentences already yielded stay valid.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        payload = {
+            'chatbot_id': self.chatbot_id,
+            'message': message,
+            'caller': caller_number,
+            'history': history or [],
+            'stream': True,
+        }
+
+        with self.session.post(
+            self.api_url,
+            json=payload,
+            stream=True,
+            timeout=(self.connect_timeout, max(deadline_at - time.monotonic(), 0.1)),
+        ) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+
+            if 'application/json' in content_type:
+                data = response.json()
+                text = data.get('response') or data.get('text') or ''
+                for sentence in SENTENCE_END.split(text.strip()):
+                    if sentence:
+                        yield sentence
+                return
+
+            buffer = ''
+            for token in self._iter_tokens(response, 'text/event-stream' in content_type):
+                if time.monotonic() > deadline_at:
+                    raise ChatbotTimeout(f"No complete reply within {deadline or self.deadline}s")
+                buffer += token
+                *sentences, buffer = SENTENCE_END.split(buffer)
+                for sentence in sentences:
+                    if sentence.strip():
+                        yield sentence.strip()
+            if buffer.strip():
+                yield buffer.strip()
+
+    def _iter_tokens(self, response, is_event_stream):
+        """Yield text tokens from an SSE or plain chunked body"""
+        if not is_event_stream:
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+            return
+
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                return
+            try:
+                event = json.loads(data)
+            except ValueError:
+                yield data
+                continue
+            if isinstance(event, dict):
+                yield event.get('token') or event.get('text') or ''
+            else:
+                yield str(event)
+
+    def complete(self, message, caller_number=None, history=None, deadline=None, on_sentence=None):
+        """Return the full reply, or the sentences received before the deadline
+
+        The reply is a ChatbotReply, marked truncated when the deadline cut it
+        short. Returns None when the backend fails or produced nothing in time.
+        on_sentence(sentence) is called with each sentence as it arrives, so the
+        start of the reply can be spoken while the rest is generated.
+        """
+        sentences = []
+        truncated = False
+        try:
+            for sentence in self.stream_sentences(message, caller_number, history, deadline):
+                sentences.append(sentence)
+                if on_sentence:
+                    on_sentence(sentence)
+        except ChatbotTimeout as e:
+            truncated = True
+            logger.warning(f"Chatbot deadline reached after {len(sentences)} sentence(s): {e}")
+        except requests.RequestException as e:
+            truncated = True
+            logger.error(f"Chatbot request failed: {e}")
+        if not sentences:
+            return None
+        reply = ChatbotReply(' '.join(sentences))
+        reply.truncated = truncated
+        return reply
+
+    def close(self):
+        """Release pooled connections"""
+        self.session.close()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ChatLLM backend
+Streams a canned reply as server-sent events so the client, benchmarks and
+load tests can run without network access
+
+Usage: python chatbot_stub.py [port] [--delay SECONDS] [--token-delay SECONDS]
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = ("Thanks for asking! Our lawn care visits start at fifty dollars. "
+                 "Window washing is priced by home size. Would you like a free estimate?")
+
+
+def make_handler(reply=DEFAULT_REPLY, delay=0.0, token_delay=0.0):
+    """Build a request handler class with the given latency profile"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(delay)
+
+            if not payload.get('stream'):
+                body = json.dumps({'response': reply}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token in reply.split(' '):
+                self._write_chunk(f"data: {json.dumps({'token': token + ' '})}\n\n")
+                time.sleep(token_delay)
+            self._write_chunk('data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+
+        def _write_chunk(self, text):
+            data = text.encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-stream (deadline tests) are expected
+        pass
+
+
+def serve(port=8765, reply=DEFAULT_REPLY, delay=0.0, token_delay=0.0):
+    """Create (but don't start) a threaded stub server"""
+    return StubServer(('127.0.0.1', port), make_handler(reply, delay, token_delay))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ChatLLM stub server')
+    parser.add_argument('port', nargs='?', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between tokens')
+    args = parser.parse_args()
+
+    server = serve(args.port, delay=args.delay, token_delay=args.token_delay)
+    print(f"🤖 ChatLLM stub listening on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
@@ -6,6 +6,8 @@ import os
 import sys
 from dotenv import load_dotenv
 
+from twilio_provisioning import NumberProvisioner, client_from_env, expected_webhooks, format_change
+
 def check_twilio_config():
     """Check current Twilio configuration"""
     print("🔍 Twilio Configuration Diagnostic")
@@ -42,6 +44,22 @@ def check_twilio_config():
             else:
                 print(f"   ✅ {var_name}: {var_value}")
     
+    # Compare every number's webhooks against WEBHOOK_BASE_URL (read only)
+    if not issues_found:
+        print("\n📱 Phone Number Webhooks:")
+        try:
+            summary = NumberProvisioner(client_from_env()).reconcile(
+                expected_webhooks(required_vars['WEBHOOK_BASE_URL']), dry_run=True,
+                on_change=lambda change, error: print("   ⚠️  " + format_change(change))
+            )
+            print(f"   {summary['checked']} numbers checked, {summary['changed']} misconfigured")
+            if summary['changed']:
+                issues_found.append(f"{summary['changed']} numbers point at the wrong webhooks "
+                                    "(fix with: python deploy.py sync-webhooks)")
+        except Exception as e:
+            print(f"   ❌ Could not list phone numbers: {e}")
+            issues_found.append("Twilio API request failed (check the credentials)")
+    
     print("\n🔧 Issues Found:")
     if not issues_found:
         print("   🎉 No issues found with environment variables!")
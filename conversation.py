@@ -0,0 +1,43 @@
+"""
+Conversation flow for a call: decides what happens after each caller turn
+The limits are enforced from the server-side call session, so a caller
+can't keep a call (and a worker) busy indefinitely
+"""
+import time
+
+# Next steps returned by ConversationPolicy.next_step
+TRANSFER = 'transfer'
+GOODBYE = 'goodbye'
+CONTINUE = 'continue'  # answer, then gather another question
+CLOSE = 'close'        # answer (if any), then end the call
+
+
+class ConversationPolicy:
+    """Multi-turn gather loop bounded by turn count and call duration"""
+
+    def __init__(self, max_turns=5, max_seconds=300):
+        self.max_turns = max_turns
+        self.max_seconds = max_seconds
+
+    def next_step(self, intent_match, session, has_speech=True):
+        """Pick the next step for the caller turn being handled
+
+        session is the call session as loaded before this turn is recorded.
+        It may be None when the request carried no CallSid; the turn
+        is then treated as the last one since nothing bounds the loop.
+        """
+        if TRANSFER in intent_match.intents:
+            return TRANSFER
+        if GOODBYE in intent_match.intents:
+            return GOODBYE
+        if not has_speech or not self.within_limits(session):
+            return CLOSE
+        return CONTINUE
+
+    def within_limits(self, session):
+        """True if the call may take another question after the current one"""
+        if session is None:
+            return False
+        if session.caller_turns + 1 >= self.max_turns:
+            return False
+        return time.time() - session.started_at < self.max_seconds
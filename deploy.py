@@ -7,9 +7,11 @@ Helps set up Twilio phone number and webhooks
 
 import os
 import sys
-from twilio.rest import Client
 from dotenv import load_dotenv
 
+from twilio_provisioning import (NumberProvisioner, client_from_env, expected_webhooks,
+                                 format_change)
+
 # Load environment variables
 load_dotenv()
 
@@ -29,7 +31,7 @@ def setup_twilio_phone_number():
         return False
     
     try:
-        client = Client(account_sid, auth_token)
+        client = client_from_env()
         
         print("🔍 Searching for available phone numbers...")
         
@@ -60,10 +62,7 @@ def setup_twilio_phone_number():
         # Purchase the phone number
         purchased_number = client.incoming_phone_numbers.create(
             phone_number=selected_number.phone_number,
-            voice_url=f"{webhook_base_url}/voice",
-            voice_method='POST',
-            status_callback=f"{webhook_base_url}/call_status",
-            status_callback_method='POST'
+            **expected_webhooks(webhook_base_url)
         )
         
         print(f"✅ Successfully purchased: {purchased_number.phone_number}")
@@ -88,6 +87,27 @@ def setup_twilio_phone_number():
         print(f"❌ Error setting up phone number: {str(e)}")
         return False
 
+def sync_webhooks(dry_run=False):
+    """Point every number on the account at this deployment's webhooks"""
+    webhook_base_url = os.getenv('WEBHOOK_BASE_URL')
+    client = client_from_env()
+    
+    if not client or not webhook_base_url:
+        print("❌ Missing required environment variables:")
+        print("   - TWILIO_ACCOUNT_SID")
+        print("   - TWILIO_AUTH_TOKEN")
+        print("   - WEBHOOK_BASE_URL")
+        return False
+    
+    print("🔍 Checking phone number webhooks..." + (" (dry run)" if dry_run else ""))
+    summary = NumberProvisioner(client).reconcile(
+        expected_webhooks(webhook_base_url), dry_run=dry_run,
+        on_change=lambda change, error: print(format_change(change, error))
+    )
+    verb = "to update" if dry_run else "updated"
+    print(f"📱 {summary['checked']} numbers checked, {summary['changed']} {verb}, {summary['failed']} failed")
+    return summary['failed'] == 0
+
 def test_webhooks():
     """Test webhook endpoints"""
     webhook_base_url = os.getenv('WEBHOOK_BASE_URL')
@@ -131,14 +151,17 @@ def main():
         
         if command == "setup-number":
             setup_twilio_phone_number()
+        elif command == "sync-webhooks":
+            sync_webhooks(dry_run="--dry-run" in sys.argv[2:])
         elif command == "test-webhooks":
             test_webhooks()
         else:
             print(f"Unknown command: {command}")
-            print("Available commands: setup-number, test-webhooks")
+            print("Available commands: setup-number, sync-webhooks, test-webhooks")
     else:
         print("Available commands:")
         print("  python deploy.py setup-number    - Purchase and configure Twilio number")
+        print("  python deploy.py sync-webhooks   - Point all numbers at WEBHOOK_BASE_URL (--dry-run to preview)")
         print("  python deploy.py test-webhooks   - Test webhook endpoints")
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""
+Local FAQ retrieval
+Every FAQ question variant becomes a row of an L2-normalized
+TF-IDF matrix (unigrams + bigrams over normalized words), built once at
+load. A transcript is scored against all variants with one matrix-vector
+product and answered directly when its cosine similarity clears a threshold,
+so common questions never reach the LLM.
+
+Entries come from the knowledge base's "faq" list (or a standalone file
+with an "entries" list, see from_file):
+  {"id": "insurance",
+   "questions": ["are you insured", "do you carry insurance"],
+   "answer": "Yes, we're fully insured."}
+"""
+import json
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from answer_cache import normalize_utterance
+
+FaqMatch = namedtuple('FaqMatch', ['id', 'answer', 'score', 'question'])
+
+# Glue words that would otherwise make unrelated questions look alike
+_STOP_WORDS = frozenset([
+    'do', 'doe', 'is', 'are', 'it', 'of', 'to', 'for', 'on', 'in', 'and', 'or', 'there',
+    'about', 'we', 'us', 'our', 'any', 'that', 'this', 'be', 'get', 'what', 'with',
+    'i', 'me', 'my', 'you', 'your', 'can', 'could', 'would',
+])
+
+
+def terms(text):
+    """Unigrams and bigrams of the normalized, stemmed utterance"""
+    words = [word for word in normalize_utterance(text).split() if word not in _STOP_WORDS]
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+class FaqIndex:
+    """Immutable TF-IDF index over FAQ question variants"""
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        variants, owners = [], []
+        for position, entry in enumerate(self.entries):
+            for question in entry['questions']:
+                variants.append(question)
+                owners.append(position)
+        self.questions = tuple(variants)
+        self._owners = np.array(owners, dtype=np.int32)
+
+        counts = [Counter(terms(question)) for question in variants]
+        self.vocabulary = {term: i for i, term in enumerate(sorted({t for c in counts for t in c}))}
+        document_frequency = np.zeros(len(self.vocabulary), dtype=np.float32)
+        matrix = np.zeros((len(variants), len(self.vocabulary)), dtype=np.float32)
+        for row, term_counts in enumerate(counts):
+            for term, count in term_counts.items():
+                column = self.vocabulary[term]
+                matrix[row, column] = 1.0 + np.log(count)
+                document_frequency[column] += 1
+        self._idf = np.log((1.0 + len(variants)) / (1.0 + document_frequency)) + 1.0
+        matrix *= self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        entries = data.get('entries') if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError(f"{path}: expected an object with an 'entries' list")
+        for entry in entries:
+            if not entry.get('answer') or not entry.get('questions'):
+                raise ValueError(f"{path}: entry {entry.get('id')!r} needs 'questions' and 'answer'")
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _query_vector(self, text):
+        """(column indices, weights) of the normalized query, or None if no term is known"""
+        counts = Counter(term for term in terms(text) if term in self.vocabulary)
+        if not counts:
+            return None
+        columns = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+        weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) \
+            * self._idf[columns]
+        return columns, weights / np.linalg.norm(weights)
+
+    def match(self, text, min_score=0.0):
+        """Best FaqMatch for text, or None if nothing scores at least min_score"""
+        query = self._query_vector(text)
+        if query is None or not self.questions:
+            return None
+        columns, weights = query
+        scores = self._matrix[:, columns] @ weights
+        best = int(np.argmax(scores))
+        return self._result(best, float(scores[best]), min_score)
+
+    def match_many(self, texts, min_score=0.0):
+        """match() for a batch of transcripts with one matrix product"""
+        queries = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            query = self._query_vector(text)
+            if query is not None:
+                queries[row, query[0]] = query[1]
+        if not self.questions:
+            return [None] * len(texts)
+        scores = queries @ self._matrix.T
+        best = np.argmax(scores, axis=1)
+        return [self._result(int(i), float(scores[row, i]), min_score) for row, i in enumerate(best)]
+
+    def _result(self, variant, score, min_score):
+        if score <= 0.0 or score < min_score:
+            return None
+        entry = self.entries[self._owners[variant]]
+        return FaqMatch(entry.get('id'), entry['answer'], score, self.questions[variant])
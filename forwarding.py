@@ -0,0 +1,113 @@
+"""
+Forwarding dispatcher
+Hands escalated calls to a list of staff numbers instead of a single owner
+line. Each forwarded call claims a slot on one number (max_calls each) until
+Twilio reports the dialed leg or the whole call as finished, so simultaneous
+escalations fan out across the team and capacity grows with its size.
+'ordered' always hunts from the top of the list; 'round_robin' rotates the
+starting number. Callers holding for a free slot are served before new
+escalations.
+
+Counts live in this process: with several gunicorn workers a callback can
+reach a worker that never saw the claim, so claims also expire after
+claim_ttl seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+ORDERED = 'ordered'
+ROUND_ROBIN = 'round_robin'
+STRATEGIES = (ORDERED, ROUND_ROBIN)
+
+
+class ForwardingDispatcher:
+    """Tracks forwarded calls per staff number and picks the next free one"""
+
+    def __init__(self, numbers, strategy=ORDERED, max_calls=1, claim_ttl=3600.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}, not {strategy!r}")
+        self.numbers = tuple(dict.fromkeys(numbers))
+        if not self.numbers:
+            raise ValueError("at least one number is needed")
+        self.strategy = strategy
+        self.max_calls = max_calls
+        self.claim_ttl = claim_ttl
+        self._active = dict.fromkeys(self.numbers, 0)
+        self._claims = {}  # call_sid -> (number, claimed_at)
+        self._waiting = OrderedDict()  # call_sid -> hold started
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def claim(self, call_sid, exclude=(), queued=False):
+        """Reserve a free number for call_sid, or None if everyone is busy
+
+        New escalations (queued=False) don't jump ahead of callers already
+        holding. A call that already has a claim gives it up first.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._release(call_sid)
+            if not queued and any(sid != call_sid for sid in self._waiting):
+                return None
+            start = self._cursor if self.strategy == ROUND_ROBIN else 0
+            for offset in range(len(self.numbers)):
+                position = (start + offset) % len(self.numbers)
+                number = self.numbers[position]
+                if number in exclude or self._active[number] >= self.max_calls:
+                    continue
+                self._active[number] += 1
+                self._claims[call_sid] = (number, now)
+                self._waiting.pop(call_sid, None)
+                self._cursor = position + 1
+                return number
+            return None
+
+    def claimed(self, call_sid):
+        """Number currently reserved for call_sid, if any"""
+        claim = self._claims.get(call_sid)
+        return claim[0] if claim else None
+
+    def release(self, call_sid):
+        """Free call_sid's slot; returns the number it held"""
+        with self._lock:
+            return self._release(call_sid)
+
+    def hold(self, call_sid):
+        """Note that call_sid is waiting in the hold queue"""
+        with self._lock:
+            self._waiting.setdefault(call_sid, time.monotonic())
+
+    def unhold(self, call_sid):
+        with self._lock:
+            self._waiting.pop(call_sid, None)
+
+    def end(self, call_sid):
+        """The call is over: drop its claim and its place in the queue"""
+        with self._lock:
+            self._waiting.pop(call_sid, None)
+            return self._release(call_sid)
+
+    def _release(self, call_sid):
+        claim = self._claims.pop(call_sid, None)
+        if claim is None:
+            return None
+        self._active[claim[0]] -= 1
+        return claim[0]
+
+    def _expire(self, now):
+        cutoff = now - self.claim_ttl
+        for call_sid in [sid for sid, (_, at) in self._claims.items() if at < cutoff]:
+            self._release(call_sid)
+        while self._waiting and next(iter(self._waiting.values())) < cutoff:
+            self._waiting.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'strategy': self.strategy,
+                'active': dict(self._active),
+                'capacity': len(self.numbers) * self.max_calls,
+                'waiting': len(self._waiting),
+            }
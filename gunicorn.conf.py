@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for the AI phone app
+Pick a serving mode with GUNICORN_WORKER_CLASS:
+
+  gthread (default)  threads per worker; no extra dependencies. Each worker
+                     serves GUNICORN_THREADS call turns at once.
+  gevent             cooperative greenlets; needs `pip install gevent`.
+                     Each worker serves GUNICORN_WORKER_CONNECTIONS call turns.
+  sync               the old one-request-per-process behaviour.
+
+Call sessions, pending answers and caches live in process memory, so
+prefer one worker with many threads/greenlets over many workers unless
+SESSION_REDIS_URL is set.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+# gunicorn silently turns sync workers with threads > 1 into gthread
+threads = int(os.getenv('GUNICORN_THREADS', '32')) if worker_class != 'sync' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))
+
+# Twilio abandons a webhook after 15s; don't let a stuck worker outlive that by much
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
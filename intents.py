@@ -0,0 +1,101 @@
+"""
+Single-pass intent matching for caller transcripts
+Compiles every keyword phrase into one word-boundary regex at import time
+"""
+import re
+from collections import namedtuple
+
+IntentMatch = namedtuple('IntentMatch', ['intents', 'phrases'])
+
+# Order in which answer intents are tried when several match (mirrors the
+# original if/elif chain in get_chatbot_response)
+ANSWER_PRIORITY = ('pricing', 'scheduling', 'services', 'hours', 'urgent')
+
+
+def _trie_pattern(phrases):
+    """Build a prefix-trie regex so matching cost doesn't grow with phrase count"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail: prefer the longest phrase, back off to a shorter one
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class IntentMatcher:
+    """Classify a transcript into every intent whose phrases it contains
+
+    All phrases are folded into a single trie-shaped regex anchored on word
+    boundaries, so classification is one regex scan no matter how many
+    phrases are configured.  A trailing plural "s" is accepted for every
+    phrase ("window" matches "windows"); other inflections ("cancelled",
+    "emergencies") only match if they are listed as phrases themselves.
+    answer_priority orders the answer intents tried by answer_intent.
+    """
+
+    def __init__(self, intent_phrases, answer_priority=ANSWER_PRIORITY):
+        self.answer_priority = tuple(answer_priority)
+        self.intent_phrases = {
+            intent: tuple(phrase.lower() for phrase in phrases)
+            for intent, phrases in intent_phrases.items()
+        }
+
+        phrase_intents = {}
+        for intent, phrases in self.intent_phrases.items():
+            for phrase in phrases:
+                phrase_intents.setdefault(phrase, set()).add(intent)
+
+        # The regex consumes the longest phrase at each position, so a phrase
+        # that contains a shorter one ("speak to someone" / "someone") must
+        # also carry the shorter phrase's intents and match names.
+        phrase_matches = {}
+        for phrase in phrase_intents:
+            words = phrase.split()
+            matches = phrase_matches[phrase] = {phrase}
+            for start in range(len(words)):
+                for end in range(start + 1, len(words) + 1):
+                    sub_phrase = ' '.join(words[start:end])
+                    for candidate in (sub_phrase, sub_phrase[:-1] if sub_phrase.endswith('s') else None):
+                        if candidate in phrase_intents:
+                            matches.add(candidate)
+
+        self._lookup = {
+            phrase: tuple(
+                (intent, sub_phrase)
+                for sub_phrase in sorted(matches)
+                for intent in sorted(phrase_intents[sub_phrase])
+            )
+            for phrase, matches in phrase_matches.items()
+        }
+
+        self._pattern = re.compile(
+            rf"(?<![\w'])({_trie_pattern(phrase_intents)})s?(?![\w'])", re.IGNORECASE
+        )
+
+    def classify(self, text):
+        """Return an IntentMatch with matched intents and the phrases that hit"""
+        intents = set()
+        phrases = {}
+        if text:
+            for match in self._pattern.finditer(text):
+                for intent, phrase in self._lookup[match.group(1).lower()]:
+                    intents.add(intent)
+                    phrases.setdefault(intent, []).append(phrase)
+        return IntentMatch(frozenset(intents), phrases)
+
+    def answer_intent(self, match):
+        """Pick the highest-priority answer intent from a classification"""
+        for intent in self.answer_priority:
+            if intent in match.intents:
+                return intent
+        return None
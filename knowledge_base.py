@@ -0,0 +1,139 @@
+"""
+Business knowledge base
+Business name, greeting, speech hints, canned answers, intent phrases, FAQ
+entries, a speech-correction lexicon and the intents whose answers promise a
+callback live in a versioned JSON file. Each load parses it into an immutable
+KnowledgeBase, and KnowledgeBaseWatcher checks the file's mtime (the tenant
+registry polls every tenant's watcher) to swap in new versions without a
+restart. Every gunicorn worker polls the same file,
+so all of them pick up an edit within one poll interval. Write the file
+atomically (write a temp file, then rename) so a half-written version is
+never read; an invalid file is logged and the previous version kept.
+
+{"version": 3,
+ "business_name": "Green Slice Lawn Care",
+ "greeting": "Thank you for calling {business_name}. How can I help?",
+ "hints": ["lawn care", "quote"],
+ "answers": {"pricing": "...", "default": "..."},
+ "callback_intents": ["pricing"],
+ "intents": {"pricing": ["price", "cost", "how much"]},
+ "faq": [{"id": "hours", "questions": ["when are you open"], "answer": "..."}],
+ "lexicon": {"long care": "lawn care", "get a coat": "get a quote"}}
+"""
+import json
+import logging
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+KnowledgeBase = namedtuple('KnowledgeBase', [
+    'version', 'business_name', 'greeting', 'hints', 'answers', 'default_answer', 'intents', 'faq', 'lexicon',
+    'callback_intents',
+])
+
+DEFAULT_GREETING = "Hello! Thank you for calling {business_name}. How can I help you today?"
+DEFAULT_ANSWER = ("Thank you for your question. I want to make sure you get the best answer. "
+                  "Would you like me to connect you with our team?")
+
+
+def parse(data, business_name=None):
+    """Validate decoded JSON and freeze it into a KnowledgeBase
+
+    business_name is used when the file doesn't name the business;
+    "{business_name}" in any text is replaced with the final name.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("knowledge base must be a JSON object")
+    version = data.get('version')
+    if not isinstance(version, (int, str)) or isinstance(version, bool):
+        raise ValueError("'version' must be a number or string")
+    name = data.get('business_name') or business_name or ''
+
+    def text(value, field):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"'{field}' must be a non-empty string")
+        return value.replace('{business_name}', name)
+
+    answers = data.get('answers', {})
+    intents = data.get('intents', {})
+    if not isinstance(answers, dict) or not isinstance(intents, dict):
+        raise ValueError("'answers' and 'intents' must be objects")
+    for intent, phrases in intents.items():
+        if not isinstance(phrases, list) or not all(isinstance(p, str) for p in phrases):
+            raise ValueError(f"intent {intent!r} must be a list of phrases")
+    faq = data.get('faq', [])
+    if not isinstance(faq, list):
+        raise ValueError("'faq' must be a list")
+    for entry in faq:
+        if not isinstance(entry, dict) or not entry.get('questions') or not entry.get('answer'):
+            raise ValueError(f"FAQ entry {entry.get('id') if isinstance(entry, dict) else entry!r} "
+                             "needs 'questions' and 'answer'")
+    lexicon = data.get('lexicon', {})
+    if not isinstance(lexicon, dict) or not all(
+            isinstance(heard, str) and heard.strip() and isinstance(meant, str) for heard, meant in lexicon.items()):
+        raise ValueError("'lexicon' must map misheard phrases to replacements")
+    callback_intents = data.get('callback_intents', [])
+    if not isinstance(callback_intents, list) or not all(isinstance(intent, str) for intent in callback_intents):
+        raise ValueError("'callback_intents' must be a list of intent names")
+
+    answers = {intent: text(answer, f'answers.{intent}') for intent, answer in answers.items()}
+    return KnowledgeBase(
+        version=version,
+        business_name=name,
+        greeting=text(data.get('greeting', DEFAULT_GREETING), 'greeting'),
+        hints=tuple(data.get('hints', ())),
+        default_answer=answers.pop('default', DEFAULT_ANSWER),
+        answers=MappingProxyType(answers),
+        intents=MappingProxyType({intent: tuple(phrases) for intent, phrases in intents.items()}),
+        faq=tuple(MappingProxyType({
+            'id': entry.get('id'),
+            'questions': tuple(entry['questions']),
+            'answer': text(entry['answer'], f"faq.{entry.get('id')}.answer"),
+        }) for entry in faq),
+        lexicon=MappingProxyType(dict(lexicon)),
+        callback_intents=frozenset(callback_intents),
+    )
+
+
+def load(path, business_name=None):
+    with open(path) as f:
+        data = json.load(f)
+    try:
+        return parse(data, business_name)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def fallback(business_name):
+    """Minimal knowledge base used when no file can be loaded"""
+    return parse({'version': 0}, business_name)
+
+
+class KnowledgeBaseWatcher:
+    """Tracks a knowledge base file and calls on_change with each new version"""
+
+    def __init__(self, path, on_change, business_name=None):
+        self.path = path
+        self.on_change = on_change
+        self.business_name = business_name
+        self._signature = None
+
+    def check(self, force=False):
+        """Reload if the file changed since the last check (or force); True if a version was applied"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature and not force:
+            return False
+        self._signature = signature
+        try:
+            knowledge_base = load(self.path, self.business_name)
+        except (OSError, ValueError) as e:
+            logger.error(f"Keeping previous knowledge base; {self.path} failed to load: {e}")
+            return False
+        self.on_change(knowledge_base)
+        return True
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Concurrency load test for the gunicorn serving modes
+Boots the app under each worker class against a slow local chatbot stub and
+ramps up simultaneous callers, reporting what one instance sustains
+
+Usage: python load_test.py [--modes sync,gthread,gevent] [--levels 1,8,32,64]
+                           [--chatbot-delay 0.5] [--calls-per-level 64]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark import free_port, start_app, start_stub
+
+
+def simulate_call(base_url, call_number, timeout):
+    """Greeting plus one question; returns (ok, seconds)"""
+    form = {
+        'CallSid': f'CA{call_number:032d}',
+        'From': f'+1555{call_number:07d}',
+        'To': '+15550000000',
+    }
+    start = time.perf_counter()
+    try:
+        with requests.Session() as session:
+            session.post(f'{base_url}/voice', data=form, timeout=timeout).raise_for_status()
+            # Unique question per call so the answer cache can't help
+            question = dict(form, SpeechResult=f'question number {call_number}', Confidence='0.9')
+            reply = session.post(f'{base_url}/process_speech', data=question, timeout=timeout)
+            ok = reply.status_code == 200 and b'<Say' in reply.content
+    except requests.RequestException:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_level(base_url, concurrency, calls, timeout):
+    """Run `calls` simulated calls with `concurrency` in flight"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda n: simulate_call(base_url, n, timeout), range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(seconds for ok, seconds in results if ok)
+    ok_count = len(latencies)
+    return {
+        'concurrency': concurrency,
+        'ok': ok_count,
+        'failed': calls - ok_count,
+        'calls_per_sec': ok_count / elapsed if elapsed else 0.0,
+        'p50': statistics.median(latencies) if latencies else float('nan'),
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare gunicorn serving modes under concurrent calls')
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    parser.add_argument('--levels', default='1,8,32,64')
+    parser.add_argument('--chatbot-delay', type=float, default=0.5, help='simulated LLM latency (s)')
+    parser.add_argument('--calls-per-level', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=15.0, help="per-request timeout, Twilio's is 15s")
+    args = parser.parse_args()
+
+    stub, chatbot_url = start_stub(args.chatbot_delay)
+
+    print(f"📈 Load test: chatbot latency {args.chatbot_delay}s, {args.calls_per_level} calls per level")
+    for mode in args.modes.split(','):
+        port = free_port()
+        try:
+            # Tiny answer cache so repeated runs still hit the stubbed backend
+            process = start_app(port, chatbot_url, mode, {'ANSWER_CACHE_SIZE': '1'})
+        except RuntimeError as e:
+            print(f"\n❌ {e} (is the worker's package installed?)")
+            continue
+        print(f"\n=== {mode} ===")
+        print(f"{'callers':>8} {'ok':>5} {'failed':>6} {'calls/s':>8} {'p50 s':>7} {'p99 s':>7}")
+        try:
+            for level in (int(n) for n in args.levels.split(',')):
+                result = run_level(f'http://127.0.0.1:{port}', level, max(args.calls_per_level, level), args.timeout)
+                print(f"{result['concurrency']:>8} {result['ok']:>5} {result['failed']:>6} "
+                      f"{result['calls_per_sec']:>8.1f} {result['p50']:>7.2f} {result['p99']:>7.2f}")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
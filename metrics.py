@@ -0,0 +1,264 @@
+"""
+In-process metrics with Prometheus text exposition
+Counters, gauges and fixed-bucket histograms keyed by label values. When
+METRICS_MULTIPROC_DIR is set each gunicorn worker periodically snapshots its
+values to <dir>/<pid>.json and /metrics sums every worker's snapshot.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *labelvalues):
+        """Return the child for these label values (cached after first use)"""
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self):
+        """{label values: value} for this process"""
+        return {key: child.value() for key, child in list(self._children.items())}
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def value(self):
+        return self._value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self._bounds)
+        for i, bound in enumerate(self._bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def value(self):
+        return {'counts': list(self._counts), 'sum': self._sum}
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry:
+    """Holds metrics and renders them, merging other workers' snapshots"""
+
+    def __init__(self):
+        self._metrics = {}
+        self.multiproc_dir = None
+        self._last_dump = 0.0
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+
+    def enable_multiprocess(self, directory, dump_interval=5.0):
+        """Snapshot this worker into directory every dump_interval seconds"""
+        os.makedirs(directory, exist_ok=True)
+        self.multiproc_dir = directory
+
+        def loop():
+            while True:
+                time.sleep(dump_interval)
+                self.dump()
+
+        threading.Thread(target=loop, name='metrics-dump', daemon=True).start()
+
+    def snapshot(self):
+        return {name: {_encode(key): value for key, value in metric.snapshot().items()}
+                for name, metric in self._metrics.items()}
+
+    def dump(self):
+        """Atomically write this process's snapshot"""
+        if not self.multiproc_dir:
+            return
+        data = json.dumps({'pid': os.getpid(), 'metrics': self.snapshot()})
+        fd, tmp_path = tempfile.mkstemp(dir=self.multiproc_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.multiproc_dir, f'{os.getpid()}.json'))
+
+    def _collect(self):
+        """Merged {name: {label key: value}} across live snapshots"""
+        if not self.multiproc_dir:
+            return self.snapshot()
+        self.dump()
+        merged = {}
+        for filename in os.listdir(self.multiproc_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(snapshot['pid'])
+            for name, values in snapshot['metrics'].items():
+                metric = self._metrics.get(name)
+                # Gauges describe live state, so a dead worker's gauges are dropped
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                target = merged.setdefault(name, {})
+                for key, value in values.items():
+                    target[key] = _add(target.get(key), value)
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        collected = self._collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(collected.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, _decode(key)))
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value["sum"])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _encode(key):
+    return '\x1f'.join(key)
+
+
+def _decode(key):
+    return key.split('\x1f') if key else []
+
+
+def _add(total, value):
+    if total is None:
+        return value
+    if isinstance(value, dict):
+        return {'counts': [a + b for a, b in zip(total['counts'], value['counts'])],
+                'sum': total['sum'] + value['sum']}
+    return total + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+REGISTRY = Registry()
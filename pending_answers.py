@@ -0,0 +1,92 @@
+"""
+Background chatbot answers for the filler-then-redirect call flow
+A webhook submits the slow backend call here and returns immediately; the
+polling webhook picks the answer up by CallSid once it's ready, and for a
+streaming answer can speak the sentences that have already arrived
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Poll results
+READY = 'ready'
+PENDING = 'pending'
+MISSING = 'missing'
+
+
+class _PendingAnswer:
+    __slots__ = ('future', 'started', 'sentences')
+
+    def __init__(self):
+        self.future = None
+        self.started = time.monotonic()
+        self.sentences = []
+
+
+class PendingAnswers:
+    """Bounded executor plus a CallSid -> future table"""
+
+    def __init__(self, max_workers=8, max_pending=100, stale_after=60):
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='answer')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, call_sid, fn, *args, stream=False):
+        """Start fn(*args) in the background; False if the table is full
+
+        With stream=True, fn is also passed on_sentence, a callback collecting
+        the sentences it produces before it returns.
+        """
+        with self._lock:
+            self._sweep()
+            if len(self._pending) >= self.max_pending:
+                logger.warning(f"Pending answer table full ({self.max_pending}); answering inline")
+                return False
+            entry = _PendingAnswer()
+            kwargs = {'on_sentence': entry.sentences.append} if stream else {}
+            entry.future = self._executor.submit(fn, *args, **kwargs)
+            self._pending[call_sid] = entry
+            return True
+
+    def poll(self, call_sid):
+        """Return (READY, result), (PENDING, sentences) or (MISSING, None)
+
+        sentences is what a streaming answer has produced so far. If it fails
+        after streaming, the result is the sentences that did arrive, since the
+        caller may already have heard them.
+        """
+        with self._lock:
+            entry = self._pending.get(call_sid)
+            if entry is None:
+                return MISSING, None
+            if not entry.future.done():
+                return PENDING, list(entry.sentences)
+            del self._pending[call_sid]
+        try:
+            result = entry.future.result()
+        except Exception as e:
+            logger.error(f"Background answer for {call_sid} failed: {str(e)}")
+            result = None
+        if not result and entry.sentences:
+            result = ' '.join(entry.sentences)
+        return READY, result
+
+    def discard(self, call_sid):
+        """Forget an answer the caller will no longer wait for"""
+        with self._lock:
+            entry = self._pending.pop(call_sid, None)
+        if entry:
+            entry.future.cancel()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _sweep(self):
+        cutoff = time.monotonic() - self.stale_after
+        for call_sid in [sid for sid, entry in self._pending.items() if entry.started < cutoff]:
+            self._pending.pop(call_sid).future.cancel()
@@ -0,0 +1,164 @@
+"""
+Opt-in hot-path profiling
+A fraction of requests (sample_rate) is profiled: a background thread samples
+their Python stacks every few milliseconds, and span() blocks record how long
+each stage took. Both are written as folded stacks ("a;b;c <weight>") that
+flamegraph.pl, speedscope or inferno render directly.
+
+With sample_rate 0 a request costs one float comparison and each span() one
+thread-local lookup.
+
+Stack sampling needs OS threads (the gthread or sync worker). Under gevent's
+monkey patching thread idents are greenlet ids that sys._current_frames()
+doesn't know, so only spans are recorded there.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class _NullSpan:
+    """Shared no-op context manager for requests that aren't profiled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_spans', '_name', '_start')
+
+    def __init__(self, spans, name):
+        self._spans = spans
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._spans.append((self._name, time.perf_counter() - self._start))
+        return False
+
+
+class Profiler:
+    """Sampling profiler plus stage spans for a random subset of requests"""
+
+    def __init__(self, sample_rate=0.0, interval=0.005, output_dir='profiles'):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.profiled_requests = 0
+        self._local = threading.local()
+        self._active = {}  # thread id -> request label
+        self._stacks = Counter()
+        self._span_totals = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._sample_stacks = None
+
+    def begin_request(self, label):
+        """Decide whether to profile the current request; True if it is"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        self._local.spans = []
+        self._local.label = label
+        with self._lock:
+            self.profiled_requests += 1
+            if self._sample_stacks is None:
+                # Decided on first use: gevent patches threading after this module is imported
+                self._sample_stacks = not _gevent_patched()
+            if not self._sample_stacks:
+                return True
+            self._active[threading.get_ident()] = label
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+                self._sampler.start()
+        self._wake.set()
+        return True
+
+    def end_request(self):
+        """Fold the current request's spans into the totals"""
+        label = getattr(self._local, 'label', None)
+        if label is None:
+            return
+        spans = self._local.spans
+        self._local.label = None
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            for name, seconds in spans:
+                self._span_totals[f'{label};{name}'] += int(seconds * 1_000_000)
+
+    def span(self, name):
+        """Context manager timing a stage of the current request"""
+        if getattr(self._local, 'label', None) is None:
+            return NULL_SPAN
+        return _Span(self._local.spans, name)
+
+    def _sample_loop(self):
+        while True:
+            if not self._active:
+                self._wake.clear()
+                self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, label in list(self._active.items()):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self._stacks[label + ';' + _fold(frame)] += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'interval_ms': self.interval * 1000,
+                'stack_sampling': self._sample_stacks is not False,
+                'profiled_requests': self.profiled_requests,
+                'pending_stacks': len(self._stacks),
+                'pending_spans': len(self._span_totals),
+                'output_dir': self.output_dir,
+            }
+
+    def dump(self):
+        """Write and reset collected data; returns the files written"""
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+            spans, self._span_totals = self._span_totals, Counter()
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}')
+        written = []
+        # Stack samples are weighted by sample count, spans by microseconds
+        for suffix, data in (('stacks.folded', stacks), ('spans.folded', spans)):
+            if data:
+                path = f'{prefix}.{suffix}'
+                with open(path, 'w') as f:
+                    f.writelines(f'{key} {count}\n' for key, count in data.most_common())
+                written.append(path)
+        return written
+
+
+def _gevent_patched():
+    """True when gevent has monkey-patched threading in this process"""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('threading'))
+
+
+def _fold(frame):
+    """Root-first 'func (file:line);...' for a frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,86 @@
+"""
+Per-key rate limiting
+GCRA (the "virtual scheduling" form of a token bucket): each key stores a
+single float, the theoretical arrival time of its next request, so a check is
+one dict lookup and one comparison. A key whose time has passed carries no
+state and is swept without changing any decision.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Process-local limiter: rate_per_minute sustained, burst at once"""
+
+    def __init__(self, rate_per_minute, burst, sweep_interval=60.0):
+        self.interval = 60.0 / rate_per_minute
+        self.tolerance = self.interval * (burst - 1)
+        self.sweep_interval = sweep_interval
+        self._tat = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def allow(self, key):
+        """Take one request for key; False if over the limit"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now)
+            if tat - now > self.tolerance:
+                return False
+            self._tat[key] = tat + self.interval
+            return True
+
+    def __len__(self):
+        return len(self._tat)
+
+    def _sweep(self, now):
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        self._next_sweep = now + self.sweep_interval
+
+
+# KEYS[1] = bucket; ARGV = now, interval, tolerance
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+if tat - now > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('SET', KEYS[1], tat + interval, 'PX', math.ceil((tat + interval - now) * 1000))
+return 1
+"""
+
+
+class RedisRateLimiter:
+    """Limiter shared by several gunicorn workers
+
+    The check runs as one Lua script so concurrent workers can't both take
+    the last slot; keys expire on their own once they carry no state.
+    """
+
+    def __init__(self, client, rate_per_minute, burst, prefix='rate_limit:'):
+        self.interval = 60.0 / rate_per_minute
+        self.tolerance = self.interval * (burst - 1)
+        self.prefix = prefix
+        self._script = client.register_script(_GCRA_SCRIPT)
+
+    def allow(self, key):
+        return bool(self._script(keys=[self.prefix + key], args=[time.time(), self.interval, self.tolerance]))
+
+
+def make_rate_limiter(redis_url=None, rate_per_minute=60, burst=10, prefix='rate_limit:'):
+    """Build a limiter, using Redis when a URL is given"""
+    if redis_url:
+        try:
+            import redis
+        except ImportError:
+            logger.error("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; "
+                         "falling back to per-worker limits")
+        else:
+            return RedisRateLimiter(redis.Redis.from_url(redis_url), rate_per_minute, burst, prefix)
+    return RateLimiter(rate_per_minute, burst)
@@ -0,0 +1,217 @@
+"""
+Call recordings
+Starts Twilio recordings and archives the finished audio off the request
+path. Webhooks only submit work; a bounded pool of threads makes the Twilio
+API calls and streams each recording in chunks from Twilio straight into
+storage (a local directory or an S3-compatible bucket such as MinIO), so
+memory use doesn't grow with recording length.
+
+Storage is chosen by URL: a path ('recordings') or 's3://bucket/prefix'.
+S3 needs the boto3 package; credentials come from the usual AWS_* variables.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Where a recording ended up: storage location and bytes written
+StoredRecording = namedtuple('StoredRecording', ['location', 'size'])
+
+
+class LocalStorage:
+    """Files under a root directory, written to a temporary name and renamed when complete"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def save(self, key, chunks):
+        path = os.path.join(self.root, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.part'
+        size = 0
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return StoredRecording(path, size)
+
+    def describe(self):
+        return self.root
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of a chunk iterator, for multipart uploads"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        count = min(len(target), len(self._buffer))
+        target[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self.size += count
+        return count
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket, uploaded in parts as the download streams"""
+
+    def __init__(self, client, bucket, prefix=''):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def save(self, key, chunks):
+        key = f'{self.prefix}/{key}' if self.prefix else key
+        reader = _ChunkReader(chunks)
+        self.client.upload_fileobj(reader, self.bucket, key)
+        return StoredRecording(f's3://{self.bucket}/{key}', reader.size)
+
+    def describe(self):
+        return f's3://{self.bucket}/{self.prefix}'.rstrip('/')
+
+
+def make_storage(url, s3_endpoint_url=None):
+    """Storage for a RECORDING_STORAGE value; falls back to a local 'recordings' directory
+    when S3 is asked for without boto3"""
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        try:
+            import boto3
+        except ImportError:
+            logger.error("RECORDING_STORAGE is an s3:// URL but the boto3 package is not installed; "
+                         "storing recordings under ./recordings")
+        else:
+            return S3Storage(boto3.client('s3', endpoint_url=s3_endpoint_url or None), bucket, prefix)
+        url = 'recordings'
+    return LocalStorage(url)
+
+
+class RecordingArchive:
+    """Bounded background pool for starting recordings and downloading finished ones
+
+    on_stored(recording_sid, call_sid, stored) and on_failed(recording_sid,
+    call_sid, error) report download outcomes (they run on worker threads).
+    """
+
+    def __init__(self, storage, auth=None, workers=4, max_pending=200, chunk_size=64 * 1024,
+                 timeout=30.0, audio_format='wav', attempts=3, retry_delay=2.0, on_stored=None, on_failed=None):
+        self.storage = storage
+        self.workers = workers
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.audio_format = audio_format
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.on_stored = on_stored
+        self.on_failed = on_failed
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.auth = auth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recording')
+        self._pending = 0
+        self._counts = {'stored': 0, 'failed': 0, 'dropped': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counts['dropped'] += 1
+                return False
+            self._pending += 1
+        self._executor.submit(self._run, fn, *args)
+        return True
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def start(self, call_sid, start_recording):
+        """Run start_recording(call_sid) in the background, retrying while the call is
+        still being set up; False if the pool is saturated"""
+        return self._submit(self._start, call_sid, start_recording)
+
+    def _start(self, call_sid, start_recording):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                start_recording(call_sid)
+                return
+            except Exception as e:
+                if attempt == self.attempts:
+                    logger.error(f"Could not start recording call {call_sid}: {e}")
+                    return
+                time.sleep(self.retry_delay)
+
+    def download(self, recording_sid, call_sid, url):
+        """Archive a finished recording in the background; False if the pool is saturated"""
+        if not self._submit(self._download, recording_sid, call_sid, url):
+            logger.warning(f"Recording pool full ({self.max_pending}); not archiving {recording_sid}")
+            return False
+        return True
+
+    def key(self, recording_sid, call_sid):
+        return f"{time.strftime('%Y/%m/%d')}/{call_sid}/{recording_sid}.{self.audio_format}"
+
+    def _download(self, recording_sid, call_sid, url):
+        error = None
+        for attempt in range(1, self.attempts + 1):
+            try:
+                with self.session.get(f'{url}.{self.audio_format}', stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    stored = self.storage.save(self.key(recording_sid, call_sid),
+                                               response.iter_content(chunk_size=self.chunk_size))
+            except Exception as e:
+                # Twilio answers 404 for a moment after the status callback; worth a retry
+                error = e
+                logger.warning(f"Downloading recording {recording_sid} failed (attempt {attempt}): {e}")
+                if attempt < self.attempts:
+                    time.sleep(self.retry_delay * attempt)
+                continue
+            with self._lock:
+                self._counts['stored'] += 1
+                self._counts['bytes'] += stored.size
+            if self.on_stored:
+                self.on_stored(recording_sid, call_sid, stored)
+            return
+        with self._lock:
+            self._counts['failed'] += 1
+        if self.on_failed:
+            self.on_failed(recording_sid, call_sid, str(error))
+
+    def stats(self):
+        with self._lock:
+            return {'storage': self.storage.describe(), 'pending': self._pending, **self._counts}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
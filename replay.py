@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Offline webhook replay
+Replays recorded Twilio webhooks through the Flask app in-process
+(app.test_client, no server or network) across a pool of worker processes,
+checks each response against the capture's expectations and reports
+throughput. Use it to regression-test FORWARD_KEYWORDS, intent phrases, the
+knowledge base or get_chatbot_response on real utterances before deploying.
+
+Captures are JSON lines, one webhook each:
+
+  {"path": "/process_speech",
+   "form": {"CallSid": "CA1", "From": "+15551234567", "To": "+15550000000",
+            "SpeechResult": "how much is lawn mowing", "Confidence": "0.91"},
+   "expect": {"intents": ["pricing"], "forwarded": false, "contains": ["<Gather"]}}
+
+expect keys (all optional):
+  status        HTTP status (default 200)
+  twiml         exact response body (a golden output)
+  contains      substrings the body must include; not_contains, must not
+  intents       exact set of intents matched
+  forwarded     false, true, or the forward reason ("keywords", "low_confidence", ...)
+
+Call event logs (CALL_EVENT_LOG) replay too: every speech_received event
+becomes a /process_speech or /process_followup post, expecting the intents
+and forward decision logged for it at the time.
+
+Webhooks sharing a CallSid run in order on one worker, which finishes each
+call with a completed /call_status, as Twilio would. Workers never validate
+signatures, throttle, record calls, write call records or callbacks, and use canned answers
+unless --chatbot-url points them at a backend (e.g. chatbot_stub.py).
+
+Usage:
+  python replay.py captures.jsonl [events.jsonl ...] [--workers 4] [--chatbot-url URL]
+                   [--write-golden golden.jsonl] [--show-failures 20]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+STAGE_PATHS = {'speech': '/process_speech', 'followup': '/process_followup'}
+
+# Worker settings that keep a replay offline and side-effect free
+REPLAY_ENV = {
+    'VALIDATE_TWILIO_SIGNATURES': 'false',
+    'RATE_LIMIT_ENABLED': 'false',
+    'CALL_RECORDS_DB': '',
+    'CALLBACKS_DB': '',
+    'ENABLE_CALL_RECORDING': 'false',
+    'ASYNC_ANSWERS': 'false',
+    'SESSION_REDIS_URL': '',
+    'METRICS_MULTIPROC_DIR': '',
+    'PROFILE_SAMPLE_RATE': '0',
+    'CALL_EVENT_LEVEL': 'INFO',
+    'CHATBOT_API_URL': '',
+    'CHATBOT_SECONDARY_API_URL': '',
+}
+
+
+def load_captures(paths):
+    """Captures from JSONL files, grouped into calls (lists in replay order)"""
+    calls = OrderedDict()
+    for path in paths:
+        with open(path) as f:
+            lines = [(f"{path}:{n}", json.loads(line)) for n, line in enumerate(f, 1) if line.strip()]
+        captures = _from_events(lines) if lines and 'event' in lines[0][1] else [
+            dict(capture, source=source) for source, capture in lines]
+        for capture in captures:
+            call_sid = capture.get('form', {}).get('CallSid') or capture['source']
+            calls.setdefault(call_sid, []).append(capture)
+    return list(calls.values())
+
+
+def _from_events(lines):
+    """Captures rebuilt from call event lines, with what was logged as expectations"""
+    captures, called, last = [], {}, {}
+    for source, event in lines:
+        call_sid = event.get('call_sid')
+        kind = event.get('event')
+        if kind == 'call_started':
+            called[call_sid] = event.get('called')
+        elif kind == 'speech_received' and event.get('stage') in STAGE_PATHS:
+            form = {'CallSid': call_sid, 'From': event.get('caller'), 'To': called.get(call_sid),
+                    'SpeechResult': event.get('transcript') or '', 'Confidence': str(event.get('confidence', 0))}
+            capture = {'path': STAGE_PATHS[event['stage']], 'source': source,
+                       'form': {key: value for key, value in form.items() if value is not None},
+                       'expect': {'intents': [], 'forwarded': False}}
+            captures.append(capture)
+            last[call_sid] = capture
+        elif kind == 'intent_matched' and call_sid in last:
+            last[call_sid]['expect']['intents'] = event.get('intents', [])
+        elif kind == 'forwarded' and call_sid in last:
+            last[call_sid]['expect']['forwarded'] = event.get('reason') or True
+    return captures
+
+
+# Worker side: one app instance per process
+
+_app = None
+_events = []
+
+
+class _EventCollector(logging.Handler):
+    """Keeps this request's call events in memory instead of writing them"""
+
+    def emit(self, record):
+        _events.append(record.msg)
+
+
+def _init_worker(env):
+    global _app
+    os.environ.update(env)
+    # Before the import, so app's logging.basicConfig doesn't log every knowledge base load
+    logging.basicConfig(level=logging.WARNING)
+    import app
+    _app = app
+    for handler in list(app.call_events.event_logger.handlers):
+        app.call_events.event_logger.removeHandler(handler)
+    app.call_events.event_logger.addHandler(_EventCollector())
+    app.call_events.event_logger.setLevel(logging.INFO)
+
+
+def _worker_pid(_):
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def replay_call(captures):
+    """Post one call's webhooks in order; a result dict per capture"""
+    client = _app.app.test_client()
+    results = []
+    for capture in captures:
+        _events.clear()
+        started = time.perf_counter()
+        response = client.post(capture['path'], data=capture.get('form', {}))
+        seconds = time.perf_counter() - started
+        intents = sorted({intent for event in _events if event['event'] == 'intent_matched'
+                          for intent in event['intents']})
+        forwards = [event.get('reason') for event in _events if event['event'] == 'forwarded']
+        results.append({
+            'status': response.status_code,
+            'twiml': response.get_data(as_text=True),
+            'intents': intents,
+            'forwarded': forwards[-1] if forwards else False,
+            'seconds': seconds,
+        })
+    form = captures[-1].get('form', {})
+    if form.get('CallSid'):
+        client.post('/call_status', data={'CallSid': form['CallSid'], 'CallStatus': 'completed',
+                                          'From': form.get('From', ''), 'To': form.get('To', '')})
+    return results
+
+
+def check(expect, result):
+    """Reasons a result misses its capture's expectations (empty when it passes)"""
+    failures = []
+    if result['status'] != expect.get('status', 200):
+        failures.append(f"status {result['status']} != {expect.get('status', 200)}")
+    if 'twiml' in expect and result['twiml'] != expect['twiml']:
+        failures.append(f"twiml differs: {result['twiml']}")
+    for text in expect.get('contains', ()):
+        if text not in result['twiml']:
+            failures.append(f"missing {text!r}")
+    for text in expect.get('not_contains', ()):
+        if text in result['twiml']:
+            failures.append(f"unexpected {text!r}")
+    if 'intents' in expect and set(result['intents']) != set(expect['intents']):
+        failures.append(f"intents {result['intents']} != {sorted(expect['intents'])}")
+    if 'forwarded' in expect:
+        wanted, got = expect['forwarded'], result['forwarded']
+        if (got != wanted) if isinstance(wanted, str) else (bool(got) != bool(wanted)):
+            failures.append(f"forwarded {got!r} != {wanted!r}")
+    return failures
+
+
+def run(calls, workers, env):
+    """Replay every call; returns per-call results, replay seconds and worker startup seconds"""
+    started = time.perf_counter()
+    chunksize = max(1, len(calls) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(env,)) as pool:
+        # Wait for every worker to load the app before timing the replay itself
+        pids = set()
+        for _ in range(20):
+            pids.update(pool.map(_worker_pid, range(workers)))
+            if len(pids) >= workers:
+                break
+        ready = time.perf_counter()
+        results = list(pool.map(replay_call, calls, chunksize=chunksize))
+    finished = time.perf_counter()
+    return results, finished - ready, ready - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Twilio webhooks through the app')
+    parser.add_argument('captures', nargs='+', help='JSONL webhook captures or call event logs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chatbot-url', help='chatbot backend for the replay (default: canned answers)')
+    parser.add_argument('--write-golden', metavar='PATH', help='save the captures with these responses as expectations')
+    parser.add_argument('--show-failures', type=int, default=20)
+    args = parser.parse_args()
+
+    calls = load_captures(args.captures)
+    env = dict(REPLAY_ENV, CHATBOT_API_URL=args.chatbot_url or '')
+    results, elapsed, startup = run(calls, args.workers, env)
+
+    webhooks = failed = 0
+    outcomes = Counter()
+    latencies = []
+    failures = []
+    golden = []
+    for captures, call_results in zip(calls, results):
+        for capture, result in zip(captures, call_results):
+            webhooks += 1
+            latencies.append(result['seconds'])
+            outcomes[f"forwarded:{result['forwarded']}" if result['forwarded'] else 'answered'] += 1
+            problems = check(capture.get('expect', {}), result)
+            if problems:
+                failed += 1
+                failures.append((capture, problems))
+            if args.write_golden:
+                expect = {'twiml': result['twiml'], 'intents': result['intents'], 'forwarded': result['forwarded']}
+                golden.append({'path': capture['path'], 'form': capture.get('form', {}), 'expect': expect})
+
+    if args.write_golden:
+        with open(args.write_golden, 'w') as f:
+            f.writelines(json.dumps(capture) + '\n' for capture in golden)
+
+    for capture, problems in failures[:args.show_failures]:
+        speech = capture.get('form', {}).get('SpeechResult')
+        print(f"FAIL {capture['source']} {capture['path']}" + (f" \"{speech}\"" if speech else ''))
+        for problem in problems:
+            print(f"     {problem}")
+    if len(failures) > args.show_failures:
+        print(f"... and {len(failures) - args.show_failures} more failures")
+
+    latencies.sort()
+    print(f"\n{webhooks} webhooks in {len(calls)} calls, {args.workers} workers "
+          f"({startup:.1f}s startup): {elapsed:.2f}s, {webhooks / elapsed if elapsed else 0:.0f} webhooks/s")
+    if latencies:
+        print(f"per webhook: p50 {statistics.median(latencies) * 1000:.2f}ms, "
+              f"p99 {latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000:.2f}ms")
+    print("outcomes: " + ', '.join(f"{name} {count}" for name, count in outcomes.most_common()))
+    print(f"{webhooks - failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
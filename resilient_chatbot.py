@@ -0,0 +1,225 @@
+"""
+Fault-tolerant access to the chatbot backend
+Each endpoint sits behind a CircuitBreaker: after consecutive failures it
+opens and calls fail fast instead of waiting out the deadline, then a single
+trial call after reset_timeout decides whether it closes again. With a
+secondary endpoint configured, a primary call still running after
+hedge_after seconds is hedged by a concurrent secondary call and the first
+usable reply wins; an open or fast-failing primary goes straight to the
+secondary. When sentences are streamed to a caller, the endpoint that
+streamed first owns the reply, so a caller never hears two different answers.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# Breaker states
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+# Why complete() returned no answer
+FAILED = 'failed'
+BREAKER_OPEN = 'breaker_open'
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, on_state_change=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go ahead (in half-open state, only the one trial call)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        logger.warning(f"Chatbot circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        if self.on_state_change:
+            self.on_state_change(self.name, state)
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'open_for': round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else None,
+        }
+
+
+class _Endpoint:
+    __slots__ = ('name', 'client', 'breaker')
+
+    def __init__(self, name, client, breaker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+
+
+class _SentenceStream:
+    """Forwards streamed sentences from whichever endpoint produces one first"""
+
+    def __init__(self, on_sentence):
+        self.on_sentence = on_sentence
+        self.owner = None
+        self._lock = threading.Lock()
+
+    def sink(self, name):
+        """on_sentence callback for one endpoint, or None if nothing is listening"""
+        if self.on_sentence is None:
+            return None
+
+        def forward(sentence):
+            with self._lock:
+                if self.owner is None:
+                    self.owner = name
+                elif self.owner != name:
+                    return
+            self.on_sentence(sentence)
+        return forward
+
+    def accepts(self, name):
+        """True unless another endpoint has already streamed part of its reply"""
+        with self._lock:
+            return self.owner in (None, name)
+
+
+class ResilientChatbot:
+    """Primary ChatbotClient plus an optional hedge, each behind a breaker"""
+
+    def __init__(self, primary, secondary=None, hedge_after=2.0, failure_threshold=5,
+                 reset_timeout=30.0, on_state_change=None, max_workers=32):
+        def endpoint(name, client):
+            breaker = CircuitBreaker(name, failure_threshold, reset_timeout, on_state_change)
+            return _Endpoint(name, client, breaker)
+
+        self.primary = endpoint('primary', primary)
+        self.secondary = endpoint('secondary', secondary) if secondary else None
+        self.hedge_after = hedge_after
+        self.deadline = primary.deadline
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chatbot-hedge') \
+            if secondary and hedge_after else None
+
+    def complete(self, message, caller_number=None, history=None, on_sentence=None):
+        """(answer, source): source is the endpoint that answered, or why none did
+
+        on_sentence(sentence) receives the reply's sentences as they stream in;
+        in a hedged race only the first endpoint to stream one is heard, and
+        its reply is the answer even if the other finishes sooner.
+        """
+        started = time.monotonic()
+        stream = _SentenceStream(on_sentence)
+        if not self.primary.breaker.allow():
+            return self._fallback_to_secondary(message, caller_number, history, started, BREAKER_OPEN, stream)
+        if self._executor is None:
+            answer = self._call(self.primary, message, caller_number, history, self.deadline,
+                                stream.sink(self.primary.name))
+            if answer:
+                return answer, self.primary.name
+            return self._fallback_to_secondary(message, caller_number, history, started, FAILED, stream)
+
+        pending = {self._executor.submit(self._call, self.primary, message, caller_number, history,
+                                         self.deadline, stream.sink(self.primary.name)): self.primary.name}
+        done, _ = wait(pending, timeout=self.hedge_after)
+        if done:
+            answer = done.pop().result()
+            if answer:
+                return answer, self.primary.name
+            return self._fallback_to_secondary(message, caller_number, history, started, FAILED, stream)
+
+        # Primary is slow: race it against the secondary for the remaining time
+        if self.secondary.breaker.allow():
+            self.hedges += 1
+            pending[self._executor.submit(self._call, self.secondary, message, caller_number, history,
+                                          self._remaining(started), stream.sink(self.secondary.name))] = \
+                self.secondary.name
+        while pending:
+            done, _ = wait(pending, timeout=self._remaining(started), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                name = pending.pop(future)
+                answer = future.result()
+                if answer and stream.accepts(name):
+                    if name == self.secondary.name:
+                        self.hedge_wins += 1
+                    return answer, name
+        return None, FAILED
+
+    def _fallback_to_secondary(self, message, caller_number, history, started, reason, stream):
+        if self.secondary is None or not self.secondary.breaker.allow():
+            return None, reason
+        answer = self._call(self.secondary, message, caller_number, history, self._remaining(started),
+                            stream.sink(self.secondary.name))
+        return (answer, self.secondary.name) if answer else (None, FAILED)
+
+    def _remaining(self, started):
+        return max(self.deadline - (time.monotonic() - started), 0.1)
+
+    @staticmethod
+    def _call(endpoint, message, caller_number, history, deadline, on_sentence=None):
+        """One backend call, reported to the endpoint's breaker however it ends
+
+        A reply cut short by the deadline or a dropped stream is still returned,
+        but counts as a failure so an endpoint that keeps stalling opens its breaker.
+        """
+        answer = None
+        try:
+            answer = endpoint.client.complete(message, caller_number, history, deadline, on_sentence=on_sentence)
+            return answer
+        finally:
+            if answer and not getattr(answer, 'truncated', False):
+                endpoint.breaker.record_success()
+            else:
+                endpoint.breaker.record_failure()
+
+    def stats(self):
+        stats = {'primary': self.primary.breaker.stats(), 'hedges': self.hedges, 'hedge_wins': self.hedge_wins}
+        if self.secondary:
+            stats['secondary'] = self.secondary.breaker.stats()
+        return stats
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self.primary.client.close()
+        if self.secondary:
+            self.secondary.client.close()
@@ -0,0 +1,302 @@
+"""
+Speech-result normalization
+Repairs likely recognition errors in a transcript before intent matching.
+Everything is precomputed from the knowledge base when it loads:
+
+  lexicon   curated phrase fixes ("long care" -> "lawn care"), one regex pass,
+            applied to every transcript
+  phonetic  Metaphone and Soundex keys of the domain vocabulary (hints and
+            intent phrases): "skedule" -> "schedule", "servise" -> "service"
+  edits     a deletion index over the same vocabulary that finds words within
+            one or two edits with dict lookups: "apointment" -> "appointment"
+
+Phonetic and edit corrections only run on transcripts below a confidence
+threshold, and only on words that aren't already known (vocabulary, FAQ and
+answer text, common speech, or an inflection of one: "cleaned") or
+contractions, so well-recognized speech passes through intact. Sounding
+alike only ranks candidates; it never allows more than max_edits, so
+"parking" can't become "pricing".
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from answer_cache import FILLER_WORDS
+
+SpeechRepair = namedtuple('SpeechRepair', ['text', 'corrections'])
+
+# Everyday words that must never be "corrected" into domain vocabulary
+COMMON_WORDS = frozenset('''
+    about after again all also always am and any anyone anything are around ask at back be because been
+    before being best better both but by call called calling came can cant come coming day days did do
+    does doing done dont down each else even ever every few find for from get gets getting give go going
+    good got great had has have having he her here him his home how if in into is it its know last let
+    long look looking lot make many may maybe more most much must need needs new next night no not now
+    of off on once one only or other our out over own part pay people per put really right said same
+    say see she should some something soon still such sure take tell than thank that thats the their
+    them then there these they thing things think this those time to today told tomorrow too try trying
+    two up us use very want wanted wants was way we week were what whats when where which while who why
+    will with work would yard yes yet you your youre could
+'''.split())
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z']*")
+# Endings that make an inflected form of a known word ("cleaned", "mowing", "quotes")
+_INFLECTIONS = ('ing', 'ed', 'es', 's', 'er', 'ers', 'ly')
+_VOWELS = frozenset('AEIOU')
+_SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(
+    ('AEIOUYHW', 'BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R')) for letter in letters}
+
+
+def soundex(word):
+    """American Soundex code: 'schedule' -> 'S234'"""
+    letters = [c for c in word.upper() if c.isalpha()]
+    if not letters:
+        return ''
+    code, last = [letters[0]], _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '0')
+        if digit != '0' and digit != last:
+            code.append(digit)
+        if letter not in 'HW':
+            last = digit
+    return ''.join(code)[:4].ljust(4, '0')
+
+
+def metaphone(word):
+    """Original Metaphone key: 'quote' and 'coat' -> 'KT'"""
+    w = ''.join(c for c in word.upper() if c.isalpha())
+    if not w:
+        return ''
+    if w[:2] in ('AE', 'GN', 'KN', 'PN', 'WR'):
+        w = w[1:]
+    elif w[0] == 'X':
+        w = 'S' + w[1:]
+    elif w[:2] == 'WH':
+        w = 'W' + w[2:]
+    key, n, i = [], len(w), 0
+    while i < n:
+        c = w[i]
+        prev = w[i - 1] if i else ''
+        nxt = w[i + 1] if i + 1 < n else ''
+        after = w[i + 2] if i + 2 < n else ''
+        if c == prev and c != 'C':
+            pass
+        elif c in _VOWELS:
+            if i == 0:
+                key.append(c)
+        elif c == 'B':
+            if not (prev == 'M' and i == n - 1):
+                key.append('B')
+        elif c == 'C':
+            if prev == 'S' and nxt in ('I', 'E', 'Y'):
+                pass
+            elif nxt == 'I' and after == 'A':
+                key.append('X')
+            elif nxt == 'H':
+                key.append('K' if prev == 'S' else 'X')
+                i += 1
+            elif nxt in ('I', 'E', 'Y'):
+                key.append('S')
+            else:
+                key.append('K')
+        elif c == 'D':
+            if nxt == 'G' and after in ('E', 'I', 'Y'):
+                key.append('J')
+                i += 1
+            else:
+                key.append('T')
+        elif c == 'G':
+            if nxt == 'H' and (not after or after not in _VOWELS):
+                i += 1
+            elif nxt == 'N' and (i + 2 == n or w[i + 2:] == 'ED'):
+                pass
+            elif nxt in ('I', 'E', 'Y') and prev != 'G':
+                key.append('J')
+            else:
+                key.append('K')
+        elif c == 'H':
+            if prev not in ('C', 'S', 'P', 'T', 'G') and nxt in _VOWELS:
+                key.append('H')
+        elif c == 'K':
+            if prev != 'C':
+                key.append('K')
+        elif c == 'P':
+            if nxt == 'H':
+                key.append('F')
+                i += 1
+            else:
+                key.append('P')
+        elif c == 'Q':
+            key.append('K')
+        elif c == 'S':
+            if nxt == 'H':
+                key.append('X')
+                i += 1
+            elif nxt == 'I' and after in ('O', 'A'):
+                key.append('X')
+            else:
+                key.append('S')
+        elif c == 'T':
+            if nxt == 'I' and after in ('O', 'A'):
+                key.append('X')
+            elif nxt == 'H':
+                key.append('0')
+                i += 1
+            elif not (nxt == 'C' and after == 'H'):
+                key.append('T')
+        elif c == 'V':
+            key.append('F')
+        elif c in ('W', 'Y'):
+            if nxt in _VOWELS:
+                key.append(c)
+        elif c == 'X':
+            key.append('KS')
+        elif c == 'Z':
+            key.append('S')
+        else:
+            key.append(c)
+        i += 1
+    return ''.join(key)
+
+
+def edit_distance(a, b):
+    """Levenshtein distance with adjacent transpositions"""
+    if a == b:
+        return 0
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                cost = previous[j - 1]
+            else:
+                cost = 1 + min(previous[j], current[j - 1], previous[j - 1])
+                if previous2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                    cost = min(cost, previous2[j - 2] + 1)
+            current[j] = cost
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word, depth):
+    """word with every combination of up to depth letters removed"""
+    variants, frontier = {word}, {word}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier if len(variant) > 2
+                    for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def max_edits(word):
+    return 1 if len(word) < 7 else 2
+
+
+def _inflection_bases(word):
+    """Words that word could be an inflection of: 'cleaned' -> 'clean', 'scheduling' -> 'schedule'"""
+    for suffix in _INFLECTIONS:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            base = word[:-len(suffix)]
+            yield base
+            yield base + 'e'
+            if len(base) > 3 and base[-1] == base[-2]:
+                yield base[:-1]
+
+
+class SpeechNormalizer:
+    """Immutable transcript repairer built from one knowledge base"""
+
+    def __init__(self, vocabulary, lexicon=None, known_words=(), min_word_length=4, cache_size=4096):
+        self.vocabulary = frozenset(word.lower() for word in vocabulary
+                                    if len(word) >= min_word_length and "'" not in word)
+        self.lexicon = {phrase.lower(): replacement for phrase, replacement in (lexicon or {}).items()}
+        self.known_words = self.vocabulary | COMMON_WORDS | FILLER_WORDS | \
+            frozenset(word.lower() for word in known_words)
+        self.min_word_length = min_word_length
+
+        self._lexicon_pattern = re.compile(
+            r"(?<![\w'])(" + '|'.join(re.escape(phrase) for phrase in sorted(self.lexicon, key=len, reverse=True))
+            + r")(?![\w'])", re.IGNORECASE
+        ) if self.lexicon else None
+
+        # Phonetic keys and deletion variants -> vocabulary words, built once;
+        # everyday words ("much", "when") are never correction targets
+        self._metaphones, self._soundexes, self._deletions = {}, {}, {}
+        for word in sorted(self.vocabulary - COMMON_WORDS):
+            self._metaphones.setdefault(metaphone(word), []).append(word)
+            self._soundexes.setdefault(soundex(word), []).append(word)
+            for variant in _deletes(word, max_edits(word)):
+                self._deletions.setdefault(variant, []).append(word)
+        self._correct_word = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base, intent_phrases=None):
+        """Vocabulary from the hints and intent phrases; FAQ and answer text count as known words"""
+        phrases = list(knowledge_base.hints)
+        for intent_phrase_list in (intent_phrases or knowledge_base.intents).values():
+            phrases.extend(intent_phrase_list)
+        text = [entry['answer'] for entry in knowledge_base.faq]
+        text.extend(question for entry in knowledge_base.faq for question in entry['questions'])
+        text.extend(knowledge_base.answers.values())
+        return cls(
+            {word for phrase in phrases for word in _WORD.findall(phrase.lower())},
+            lexicon=knowledge_base.lexicon,
+            known_words={word for line in text for word in _WORD.findall(line.lower())},
+        )
+
+    def repair(self, text, confidence=1.0, fuzzy_below=0.6):
+        """SpeechRepair with the corrected text and the (heard, replacement) pairs applied
+
+        The lexicon is always applied; phonetic and edit-distance corrections
+        only when confidence is below fuzzy_below.
+        """
+        corrections = []
+        if text and self._lexicon_pattern:
+            def replace_phrase(match):
+                replacement = self.lexicon[match.group(1).lower()]
+                corrections.append((match.group(1), replacement))
+                return replacement
+            text = self._lexicon_pattern.sub(replace_phrase, text)
+        if text and confidence < fuzzy_below:
+            def replace_word(match):
+                word = match.group(0)
+                lowered = word.lower()
+                if len(lowered) < self.min_word_length or "'" in lowered or self.is_known(lowered):
+                    return word
+                replacement = self._correct_word(lowered)
+                if replacement is None:
+                    return word
+                corrections.append((word, replacement))
+                return replacement
+            text = _WORD.sub(replace_word, text)
+        return SpeechRepair(text, tuple(corrections))
+
+    def is_known(self, word):
+        """True for a known word or an inflected form of one"""
+        return word in self.known_words or any(base in self.known_words for base in _inflection_bases(word))
+
+    def _lookup(self, word):
+        """Closest vocabulary word for an unknown word, or None"""
+        limit = max_edits(word)
+        candidates = {}
+        for variant in _deletes(word, limit):
+            for target in self._deletions.get(variant, ()):
+                candidates.setdefault(target, 0)
+        # Sounding alike ranks a candidate higher but never allows more edits
+        for target in self._metaphones.get(metaphone(word), ()):
+            candidates[target] = 1
+        for target in self._soundexes.get(soundex(word), ()):
+            candidates.setdefault(target, 0)
+            candidates[target] += 1
+
+        best, best_key = None, None
+        for target, phonetic_votes in candidates.items():
+            if abs(len(target) - len(word)) > limit:
+                continue
+            distance = edit_distance(word, target)
+            if distance > limit or distance >= len(word):
+                continue
+            key = (distance - phonetic_votes, distance, target)
+            if best_key is None or key < best_key:
+                best, best_key = target, key
+        return best
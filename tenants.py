@@ -0,0 +1,161 @@
+"""
+Multi-tenant routing
+Each business fronted by this deployment is a Tenant with its own settings,
+knowledge base, intent matcher, speech normalizer, FAQ index, pre-rendered
+TwiML, answer cache, chatbot backend (and so its own connection pools and
+circuit breakers) and forwarding dispatcher. TenantRegistry indexes every
+configured Twilio number in one dict, so finding the tenant for a webhook's
+`To` number is a single hash lookup however many tenants exist.
+
+Tenants file (TENANTS_FILE); settings left out fall back to the environment:
+  {"tenants": [{"id": "green-slice",
+                "numbers": ["+15551230000"],
+                "business_name": "Green Slice Lawn Care",
+                "owner_phone": "+15559870000",
+                "chatbot_id": "3947607fe",
+                "chatbot_api_url": "https://...",
+                "chatbot_api_key": "...",
+                "chatbot_secondary_api_url": "https://...",
+                "forward_numbers": ["+15559870000", "+15559870001"],
+                "forward_strategy": "round_robin",
+                "knowledge_base": "tenants/green-slice.json"}]}
+"""
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+
+import knowledge_base as kb_loader
+from faq import FaqIndex
+from knowledge_base import KnowledgeBaseWatcher
+from speech_normalizer import SpeechNormalizer
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_PUNCTUATION = re.compile(r'[\s().-]')
+
+# Everything built from one knowledge base version, swapped in as a single reference
+# so a request never mixes versions. twiml renders from this version's knowledge_base.
+TenantKnowledge = namedtuple('TenantKnowledge', ['knowledge_base', 'intent_matcher', 'speech_normalizer',
+                                                 'faq_index', 'twiml'])
+
+
+def normalize_number(number):
+    """E.164-style key: '+1 (555) 123-0000' -> '+15551230000'"""
+    return _NUMBER_PUNCTUATION.sub('', number or '')
+
+
+class Tenant:
+    """One business: its settings and everything derived from its knowledge base"""
+
+    def __init__(self, tenant_id, numbers=(), business_name=None, owner_phone=None, chatbot_id=None,
+                 chatbot=None, dispatcher=None, answer_cache=None, twiml=None, build_intent_matcher=None):
+        self.tenant_id = tenant_id
+        self.numbers = tuple(normalize_number(number) for number in numbers)
+        self.business_name = business_name
+        self.owner_phone = owner_phone
+        self.chatbot_id = chatbot_id
+        self.chatbot = chatbot
+        self.dispatcher = dispatcher
+        self.answer_cache = answer_cache
+        self._twiml_templates = twiml
+        self._build_intent_matcher = build_intent_matcher
+        self.knowledge = None
+        self.watcher = None
+
+    # Read through the current TenantKnowledge; code that needs several of these
+    # together should take tenant.knowledge once instead
+    knowledge_base = property(lambda self: self.knowledge.knowledge_base)
+    intent_matcher = property(lambda self: self.knowledge.intent_matcher)
+    speech_normalizer = property(lambda self: self.knowledge.speech_normalizer)
+    faq_index = property(lambda self: self.knowledge.faq_index)
+    twiml = property(lambda self: self.knowledge.twiml)
+
+    def apply_knowledge_base(self, knowledge_base):
+        """Build everything derived from a knowledge base, then swap it in at once"""
+        intent_matcher = self._build_intent_matcher(knowledge_base)
+        speech_normalizer = SpeechNormalizer.from_knowledge_base(knowledge_base, intent_matcher.intent_phrases)
+        faq_index = FaqIndex(knowledge_base.faq) if knowledge_base.faq else None
+        knowledge = TenantKnowledge(knowledge_base, intent_matcher, speech_normalizer, faq_index, None)
+        # TwiML builders read context.knowledge_base, so this cache only ever renders this version
+        self.knowledge = knowledge._replace(twiml=self._twiml_templates.bind(knowledge))
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        logger.info(f"Tenant {self.tenant_id}: knowledge base version {knowledge_base.version} applied "
+                    f"({len(knowledge_base.faq)} FAQ entries)")
+
+    def load_knowledge_base(self, path):
+        """Load path now and remember it for polling; built-in defaults if it can't be loaded"""
+        if path:
+            self.watcher = KnowledgeBaseWatcher(path, self.apply_knowledge_base, business_name=self.business_name)
+            if self.watcher.check():
+                return
+        logger.warning(f"Tenant {self.tenant_id}: no usable knowledge base at {path!r}; using built-in defaults")
+        self.apply_knowledge_base(kb_loader.fallback(self.business_name))
+
+    def close(self):
+        if self.chatbot:
+            self.chatbot.close()
+
+
+class TenantRegistry:
+    """Number -> Tenant index with a default for unknown numbers"""
+
+    def __init__(self, default, tenants=()):
+        self.default = default
+        self.tenants = (default,) + tuple(tenants)
+        self._by_number = {}
+        for tenant in self.tenants:
+            for number in tenant.numbers:
+                if number in self._by_number:
+                    raise ValueError(f"{number} is assigned to both {self._by_number[number].tenant_id} "
+                                     f"and {tenant.tenant_id}")
+                self._by_number[number] = tenant
+        self._stop = threading.Event()
+
+    def resolve(self, number):
+        """Tenant owning number (as Twilio sends it), else the default"""
+        return self._by_number.get(number, self.default)
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def check_knowledge_bases(self):
+        for tenant in self.tenants:
+            if tenant.watcher:
+                tenant.watcher.check()
+
+    def start_watching(self, interval):
+        """Poll every tenant's knowledge base from a single thread"""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.check_knowledge_bases()
+                except Exception as e:
+                    logger.error(f"Knowledge base polling error: {e}")
+
+        threading.Thread(target=loop, name='knowledge-bases', daemon=True).start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        for tenant in self.tenants:
+            tenant.close()
+
+
+def load_configs(path):
+    """Tenant settings from a tenants file"""
+    with open(path) as f:
+        data = json.load(f)
+    configs = data.get('tenants') if isinstance(data, dict) else None
+    if not isinstance(configs, list):
+        raise ValueError(f"{path}: expected an object with a 'tenants' list")
+    seen = set()
+    for config in configs:
+        if not isinstance(config, dict) or not config.get('id') or not config.get('numbers'):
+            raise ValueError(f"{path}: every tenant needs an 'id' and 'numbers'")
+        if config['id'] in seen:
+            raise ValueError(f"{path}: duplicate tenant id {config['id']!r}")
+        seen.add(config['id'])
+    return configs
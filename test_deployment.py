@@ -2,9 +2,15 @@
 """
 Test script to verify AI receptionist deployment
 """
+import os
 import requests
 import sys
 from urllib.parse import urljoin
+from dotenv import load_dotenv
+
+from twilio_signature import TwilioSignatureValidator
+
+load_dotenv()
 
 def test_deployment(base_url):
     """Test the deployed AI receptionist"""
@@ -43,18 +49,39 @@ def test_deployment(base_url):
         return False
     
     # Test 3: Voice webhook (simulate Twilio request)
-    print("\n3. Testing voice webhook...")
+    webhook_url = urljoin(base_url, '/voice')
+    webhook_data = {
+        'From': '+15551234567',
+        'To': '+15559876543',
+        'CallSid': 'test_call_123',
+        'AccountSid': 'test_account'
+    }
+    
+    print("\n3. Testing that unsigned webhooks are rejected...")
+    try:
+        response = requests.post(webhook_url, data=webhook_data, timeout=10)
+        if response.status_code == 403:
+            print(f"   ✅ Unsigned webhook refused (403)")
+        else:
+            print(f"   ❌ Unsigned webhook got {response.status_code}, expected 403")
+            print(f"   💡 Set TWILIO_AUTH_TOKEN and VALIDATE_TWILIO_SIGNATURES=true on the deployment")
+            return False
+    except Exception as e:
+        print(f"   ❌ Voice webhook error: {e}")
+        return False
+    
+    print("\n4. Testing voice webhook with a Twilio signature...")
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not auth_token:
+        print("   ❌ TWILIO_AUTH_TOKEN is not set here, so the request can't be signed")
+        return False
     try:
-        webhook_data = {
-            'From': '+15551234567',
-            'To': '+15559876543',
-            'CallSid': 'test_call_123',
-            'AccountSid': 'test_account'
-        }
+        # Signed over the URL Twilio would call; the deployment's WEBHOOK_BASE_URL must match base_url
+        signature = TwilioSignatureValidator(auth_token).compute(webhook_url, webhook_data)
         response = requests.post(
-            urljoin(base_url, '/voice'), 
+            webhook_url,
             data=webhook_data,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            headers={'X-Twilio-Signature': signature},
             timeout=10
         )
         if response.status_code == 200 and 'xml' in response.headers.get('content-type', '').lower():
@@ -67,6 +94,8 @@ def test_deployment(base_url):
                 print(f"   ⚠️  TwiML might be incomplete")
         else:
             print(f"   ❌ Voice webhook failed: {response.status_code}")
+            if response.status_code == 403:
+                print(f"   💡 Check that TWILIO_AUTH_TOKEN and WEBHOOK_BASE_URL match the deployment's")
             print(f"   📄 Response: {response.text[:200]}...")
             return False
     except Exception as e:
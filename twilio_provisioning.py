@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Twilio number provisioning
+One pooled, retrying Twilio client shared by the deployment scripts, and a
+reconciler that points a pool of phone numbers at this app's webhooks.
+Numbers are streamed page by page (up to 1000 per request) and every number
+whose voice_url or status_callback is off is handed to a thread pool as soon
+as its page arrives, so hundreds of numbers are fixed in a few seconds. A dry
+run prints the diff without changing anything.
+
+Set TWILIO_API_BASE_URL (or pass --api-base-url) to run against a local fake
+of the REST API.
+
+CLI:
+  python twilio_provisioning.py audit
+  python twilio_provisioning.py reconcile [--dry-run] [--number +15551234567 ...]
+"""
+import argparse
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+from urllib3.util.retry import Retry
+
+# Phone number settings the reconciler manages
+WEBHOOK_FIELDS = ('voice_url', 'voice_method', 'status_callback', 'status_callback_method')
+
+# changes: {field: (current, wanted)} for every field that differs
+NumberChange = namedtuple('NumberChange', ['sid', 'phone_number', 'changes'])
+
+
+def create_client(account_sid, auth_token, pool_size=16, timeout=10.0, max_retries=3, base_url=None):
+    """Twilio client on one keep-alive session sized for pool_size threads
+
+    Rate limiting (429) and server errors are retried with backoff, honouring
+    Retry-After; number updates are idempotent, so POSTs are retried too.
+    """
+    http_client = TwilioHttpClient(pool_connections=True, timeout=timeout)
+    retry = Retry(total=max_retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=None, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    http_client.session.mount('http://', adapter)
+    http_client.session.mount('https://', adapter)
+    client = Client(account_sid, auth_token, http_client=http_client)
+    if base_url:
+        client.api.base_url = base_url.rstrip('/')
+    return client
+
+
+def client_from_env(pool_size=16):
+    """Shared client from TWILIO_ACCOUNT_SID/TWILIO_AUTH_TOKEN, or None if they aren't set"""
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not account_sid or not auth_token:
+        return None
+    return create_client(account_sid, auth_token, pool_size=pool_size,
+                         base_url=os.getenv('TWILIO_API_BASE_URL') or None)
+
+
+def expected_webhooks(webhook_base_url):
+    """Settings every number should have for this deployment"""
+    base = webhook_base_url.rstrip('/')
+    return {
+        'voice_url': f"{base}/voice",
+        'voice_method': 'POST',
+        'status_callback': f"{base}/call_status",
+        'status_callback_method': 'POST',
+    }
+
+
+def diff(number, wanted):
+    """NumberChange for a number resource, or None if it already matches"""
+    changes = {}
+    for field, value in wanted.items():
+        current = getattr(number, field, None)
+        # Twilio reports methods in upper case but accepts either
+        if field.endswith('_method') and current and value:
+            if current.upper() == value.upper():
+                continue
+        elif current == value:
+            continue
+        changes[field] = (current, value)
+    return NumberChange(number.sid, number.phone_number, changes) if changes else None
+
+
+class NumberProvisioner:
+    """Streams an account's phone numbers and reconciles their webhooks concurrently"""
+
+    def __init__(self, client, workers=16, page_size=1000):
+        self.client = client
+        self.workers = workers
+        self.page_size = page_size
+
+    @property
+    def _numbers(self):
+        return self.client.api.v2010.account.incoming_phone_numbers
+
+    def numbers(self, phone_numbers=None):
+        """Yield number resources: every number on the account, streamed a page at a
+        time, or just the given phone numbers, looked up concurrently"""
+        if not phone_numbers:
+            yield from self._numbers.stream(page_size=self.page_size)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='twilio-fetch') as executor:
+            for found in executor.map(lambda phone: self._numbers.list(phone_number=phone, limit=1),
+                                      phone_numbers):
+                yield from found
+
+    def plan(self, wanted, phone_numbers=None):
+        """Yield a NumberChange for each number that needs updating"""
+        for number in self.numbers(phone_numbers):
+            change = diff(number, wanted)
+            if change:
+                yield change
+
+    def apply(self, change):
+        """Push one NumberChange; returns the updated resource"""
+        return self._numbers(change.sid).update(
+            **{field: wanted for field, (_, wanted) in change.changes.items()})
+
+    def reconcile(self, wanted, phone_numbers=None, dry_run=False, on_change=None):
+        """Bring numbers in line with wanted; updates start while later pages load
+
+        on_change(change, error) is called once per differing number (error is
+        None when it was updated, or always in a dry run). Returns counts of
+        numbers 'checked', 'changed' and 'failed'.
+        """
+        summary = {'checked': 0, 'changed': 0, 'failed': 0}
+
+        def report(change, error=None):
+            summary['failed' if error else 'changed'] += 1
+            if on_change:
+                on_change(change, error)
+
+        def checked(numbers):
+            for number in numbers:
+                summary['checked'] += 1
+                yield number
+
+        if dry_run:
+            for number in checked(self.numbers(phone_numbers)):
+                change = diff(number, wanted)
+                if change:
+                    report(change)
+            return summary
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='twilio-update') as executor:
+            pending = []
+            for number in checked(self.numbers(phone_numbers)):
+                change = diff(number, wanted)
+                if change:
+                    pending.append((change, executor.submit(self.apply, change)))
+            for change, future in pending:
+                error = future.exception()
+                report(change, error)
+        return summary
+
+
+def format_change(change, error=None):
+    lines = [f"{change.phone_number} ({change.sid})" + (f" FAILED: {error}" if error else '')]
+    for field, (current, wanted) in change.changes.items():
+        lines.append(f"   {field}: {current or '(unset)'} -> {wanted}")
+    return '\n'.join(lines)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Audit or fix the webhooks of this account's Twilio numbers")
+    parser.add_argument('command', choices=('audit', 'reconcile'))
+    parser.add_argument('--dry-run', action='store_true', help='show what reconcile would change')
+    parser.add_argument('--number', action='append', dest='numbers', help='limit to these phone numbers')
+    parser.add_argument('--webhook-base-url', default=os.getenv('WEBHOOK_BASE_URL'))
+    parser.add_argument('--api-base-url', default=os.getenv('TWILIO_API_BASE_URL'))
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not all([account_sid, auth_token, args.webhook_base_url]):
+        print("❌ TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN and WEBHOOK_BASE_URL are required")
+        return 1
+
+    client = create_client(account_sid, auth_token, pool_size=args.workers, base_url=args.api_base_url)
+    provisioner = NumberProvisioner(client, workers=args.workers)
+    summary = provisioner.reconcile(
+        expected_webhooks(args.webhook_base_url), phone_numbers=args.numbers,
+        dry_run=args.command == 'audit' or args.dry_run,
+        on_change=lambda change, error: print(format_change(change, error)))
+    verb = 'to change' if args.command == 'audit' or args.dry_run else 'changed'
+    print(f"{summary['checked']} numbers checked, {summary['changed']} {verb}, {summary['failed']} failed")
+    return 1 if summary['failed'] or (args.command == 'audit' and summary['changed']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
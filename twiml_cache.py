@@ -0,0 +1,88 @@
+"""
+Pre-rendered TwiML documents for prompts that only depend on configuration
+Each document is built once, then served as bytes with Content-Length and ETag
+"""
+import hashlib
+import threading
+from collections import namedtuple
+
+from flask import Response
+
+RenderedTwiml = namedtuple('RenderedTwiml', ['body', 'content_length', 'etag'])
+
+
+class TwimlCache:
+    """Lazily render registered TwiML builders and keep the serialized bytes
+
+    Builders are callables returning a VoiceResponse, rendered on first use.
+    A cache made with bind(context) shares the builders but renders its own
+    documents, passing context to each builder; tenants bind a fresh cache to
+    each knowledge base version, so a rendered document never goes stale.
+    """
+
+    def __init__(self, builders=None, context=None):
+        self._builders = {} if builders is None else builders
+        self._context = context
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def bind(self, context):
+        """A cache over the same builders whose documents are rendered for context"""
+        return TwimlCache(self._builders, context)
+
+    def register(self, name):
+        """Decorator registering a builder under name"""
+        def decorator(builder):
+            self._builders[name] = builder
+            return builder
+        return decorator
+
+    def get(self, name):
+        """Return the RenderedTwiml for name, rendering it on first use"""
+        rendered = self._rendered.get(name)
+        if rendered is None:
+            with self._lock:
+                rendered = self._rendered.get(name)
+                if rendered is None:
+                    builder = self._builders[name]
+                    document = builder() if self._context is None else builder(self._context)
+                    body = str(document).encode('utf-8')
+                    rendered = RenderedTwiml(
+                        body=body,
+                        content_length=len(body),
+                        etag=hashlib.sha1(body).hexdigest(),
+                    )
+                    self._rendered[name] = rendered
+        return rendered
+
+    def response(self, name):
+        """Build a Flask Response serving the cached document"""
+        rendered = self.get(name)
+        response = Response(rendered.body, mimetype='text/xml')
+        response.headers['Content-Length'] = str(rendered.content_length)
+        response.set_etag(rendered.etag)
+        return response
+
+    def response_with(self, name, *verbs):
+        """Serve the cached document with verbs spliced in before its contents
+
+        Lets a dynamic answer (e.g. a Say) reuse a pre-rendered prompt
+        without rebuilding the whole VoiceResponse tree.
+        """
+        return self._spliced(name, verbs, after=False)
+
+    def response_followed_by(self, name, *verbs):
+        """Serve the cached document with verbs appended after its contents"""
+        return self._spliced(name, verbs, after=True)
+
+    def _spliced(self, name, verbs, after):
+        body = self.get(name).body
+        verbs = ''.join(verb.to_xml(xml_declaration=False) for verb in verbs).encode('utf-8')
+        marker = b'</Response>' if after else b'<Response>'
+        if marker in body:
+            head, tail = body.split(marker, 1)
+            body = head + verbs + marker + tail if after else head + marker + verbs + tail
+        else:
+            # Document was an empty <Response />
+            body = body.replace(b'<Response />', b'<Response>' + verbs + b'</Response>')
+        return Response(body, mimetype='text/xml')